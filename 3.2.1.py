@@ -1,26 +1,122 @@
+import argparse
 import csv
+import os
+from collections import OrderedDict
 
-file_name = input("Введите название файла: ")
-is_first = True
-rows_count = 0
-new_files = {}
-headlines_list = []
-
-with open(file_name, encoding="utf-8-sig") as File:
-    reader = csv.reader(File)
-    for row in reader:
-        if is_first:
-            headlines_list = row
-            is_first = False
-        else:
-            if row[-1][:4] in new_files.keys():
-                new_files[row[-1][:4]].append(row)
-            else:
-                new_files[row[-1][:4]] = [headlines_list, row]
-
-for year in new_files:
-    with open(f'new_files/new_file_{year}.csv', 'w', newline='', encoding="utf-8-sig") as csvfile:
-        writer = csv.writer(csvfile, delimiter=',',
-                            quotechar='|', quoting=csv.QUOTE_MINIMAL)
-        for row in new_files[year]:
-            writer.writerow(row)
\ No newline at end of file
+PARTITION_KEYS = {"year": 4, "year-month": 7, "date": 10}
+BUFFER_SIZE = 1024 * 1024
+MAX_OPEN_FILES = 64
+
+
+class PartitionWriters:
+    """Пул открытых файлов для частей исходного файла.
+    Держит открытыми не больше max_open_files файлов, закрывая давно не использованные;
+    при повторном обращении к закрытой части файл дописывается.
+
+    Attributes:
+        directory (string): папка для частей
+        headlines_list (list): заголовки, записываемые в начало каждой части
+        max_open_files (int): наибольшее количество одновременно открытых файлов
+        buffer_size (int): размер буфера записи одного файла
+        writers (OrderedDict): словарь типа {часть : (файл, csv.writer)} в порядке использования
+        created (set): части, файлы которых уже созданы в этом запуске
+    """
+
+    def __init__(self, directory, headlines_list, max_open_files=MAX_OPEN_FILES, buffer_size=BUFFER_SIZE):
+        """Инициализируект объект PartitionWriters
+        Args:
+            directory (string): папка для частей
+            headlines_list (list): заголовки
+            max_open_files (int): наибольшее количество одновременно открытых файлов
+            buffer_size (int): размер буфера записи одного файла
+        """
+        self.directory = directory
+        self.headlines_list = headlines_list
+        self.max_open_files = max_open_files
+        self.buffer_size = buffer_size
+        self.writers = OrderedDict()
+        self.created = set()
+
+    def get_writer(self, key):
+        """Возвращает writer для части, при необходимости открывая её файл
+        Args:
+            key (string): часть (год, год-месяц или дата)
+        Returns:
+            csv.writer: writer части
+        """
+        if key in self.writers:
+            self.writers.move_to_end(key)
+            return self.writers[key][1]
+        if len(self.writers) >= self.max_open_files:
+            self.writers.popitem(last=False)[1][0].close()
+        is_new = key not in self.created
+        file = open(os.path.join(self.directory, f"new_file_{key}.csv"), "w" if is_new else "a",
+                    newline="", encoding="utf-8-sig", buffering=self.buffer_size)
+        writer = csv.writer(file)
+        if is_new:
+            writer.writerow(self.headlines_list)
+            self.created.add(key)
+        self.writers[key] = (file, writer)
+        return writer
+
+    def close(self):
+        """Закрывает все открытые файлы"""
+        while self.writers:
+            self.writers.popitem()[1][0].close()
+
+
+def split_file(file_name, directory, partition_key="year", max_open_files=MAX_OPEN_FILES):
+    """Построчно разбивает файл вакансий на части по дате публикации
+    Args:
+        file_name (string): название файла
+        directory (string): папка для частей
+        partition_key (string): ключ разбиения, один из PARTITION_KEYS
+        max_open_files (int): наибольшее количество одновременно открытых файлов
+    Returns:
+        list: отсортированный список частей
+    >>> import codecs, io, tempfile
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     keys = split_file("vacancies.csv", directory, "date", max_open_files=1)
+    ...     shards = []
+    ...     for key in keys:
+    ...         with open(os.path.join(directory, f"new_file_{key}.csv"), "rb") as File:
+    ...             shards.append(File.read())
+    >>> with open("vacancies.csv", encoding="utf-8-sig") as File:
+    ...     rows = list(csv.reader(File))
+    >>> shard_rows = [list(csv.reader(io.StringIO(shard.decode("utf-8-sig"), newline=""))) for shard in shards]
+    >>> len(keys), all(shard.startswith(codecs.BOM_UTF8) and shard.count(codecs.BOM_UTF8) == 1 for shard in shards)
+    (13, True)
+    >>> all(shard[0] == rows[0] and rows[0] not in shard[1:] for shard in shard_rows)
+    True
+    >>> sum(len(shard) - 1 for shard in shard_rows) == sum(len(row) == len(rows[0]) for row in rows[1:])
+    True
+    """
+    key_length = PARTITION_KEYS[partition_key]
+    os.makedirs(directory, exist_ok=True)
+    with open(file_name, encoding="utf-8-sig") as File:
+        reader = csv.reader(File)
+        headlines_list = next(reader, None)
+        if headlines_list is None:
+            return []
+        date_index = headlines_list.index("published_at") if "published_at" in headlines_list else -1
+        writers = PartitionWriters(directory, headlines_list, max_open_files)
+        try:
+            for row in reader:
+                if len(row) != len(headlines_list):
+                    continue
+                writers.get_writer(row[date_index][:key_length]).writerow(row)
+        finally:
+            writers.close()
+    return sorted(writers.created)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Разбиение файла вакансий на части по дате публикации")
+    parser.add_argument("file", help="файл вакансий")
+    parser.add_argument("-o", "--output", default="new_files", help="папка для частей")
+    parser.add_argument("-k", "--key", choices=PARTITION_KEYS, default="year", help="ключ разбиения")
+    parser.add_argument("--max-open-files", type=int, default=MAX_OPEN_FILES,
+                        help="наибольшее количество одновременно открытых файлов")
+    args = parser.parse_args()
+    for key in split_file(args.file, args.output, args.key, args.max_open_files):
+        print(os.path.join(args.output, f"new_file_{key}.csv"))
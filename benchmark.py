@@ -0,0 +1,478 @@
+import argparse
+import csv
+import hashlib
+import importlib.util
+import json
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from main import DataSet, Report, currency_to_rub
+
+HEADLINES = ["name", "description", "key_skills", "experience_id", "premium", "employer_name", "salary_from",
+             "salary_to", "salary_gross", "salary_currency", "area_name", "published_at"]
+NAMES = ["Программист", "Программист 1С", "Python-разработчик", "Java-разработчик", "Frontend-разработчик",
+         "Аналитик", "Системный аналитик", "Тестировщик", "Системный администратор", "Менеджер по продажам",
+         "Руководитель группы разработчиков", "Специалист службы поддержки", "Дизайнер", "DevOps-инженер",
+         "Инженер-программист", "Бухгалтер", "Оператор call-центра", "Data Scientist"]
+CURRENCIES_MIX = "RUR=0.9,USD=0.03,EUR=0.02,KZT=0.02,BYR=0.01,UAH=0.01,UZS=0.005,KGS=0.005"
+CITIES_MIX = ("Москва=0.3,Санкт-Петербург=0.15,Новосибирск=0.05,Екатеринбург=0.05,Казань=0.04,"
+              "Нижний Новгород=0.04,Краснодар=0.03,Минск=0.03,Алматы=0.03,Воронеж=0.02,Самара=0.02,"
+              "Пермь=0.02,Ростов-на-Дону=0.02,Уфа=0.02,Владивосток=0.01,Тюмень=0.01,Сургут=0.005,Дубна=0.005")
+YEARS_MIX = "2007-2022"
+STAGES = ("split", "parse", "dataset", "aggregate", "excel", "excel_full", "charts", "pdf")
+
+
+def parse_mix(text):
+    """Разбирает описание распределения вида "RUR=0.9,USD=0.1" или диапазона годов вида "2007-2022"
+    Args:
+        text (string): описание распределения
+    Returns:
+        dict: Словарь типа {ключ-значение : значение-вес}
+    >>> parse_mix("RUR=0.9,USD=0.1")
+    {'RUR': 0.9, 'USD': 0.1}
+    >>> parse_mix("2020-2022")
+    {'2020': 1.0, '2021': 1.0, '2022': 1.0}
+    """
+    if "=" not in text and "-" in text:
+        first, last = text.split("-")
+        return {str(year): 1.0 for year in range(int(first), int(last) + 1)}
+    mix = {}
+    for item in text.split(","):
+        key, _, weight = item.partition("=")
+        mix[key.strip()] = float(weight) if weight else 1.0
+    return mix
+
+
+def generate_csv(target_name, rows_count, currencies=CURRENCIES_MIX, cities=CITIES_MIX, years=YEARS_MIX,
+                 invalid_share=0.1, seed=0, extra_cities=0):
+    """Создаёт синтетический файл вакансий со схемой vacancies.csv
+    Args:
+        target_name (string): файл для записи
+        rows_count (int): количество вакансий
+        currencies (string): распределение валют
+        cities (string): распределение городов
+        years (string): распределение или диапазон годов публикации
+        invalid_share (float): доля некорректных строк (с пустым полем или лишним столбцом)
+        seed (int): начальное значение генератора случайных чисел
+        extra_cities (int): количество дополнительных редких городов, вместе занимающих 10% вакансий
+    """
+    generator = random.Random(seed)
+    currencies, cities, years = parse_mix(currencies), parse_mix(cities), parse_mix(years)
+    if extra_cities:
+        cities = {city: weight * 0.9 for city, weight in cities.items()}
+        cities.update((f"Город {i}", 0.1 / extra_cities) for i in range(extra_cities))
+    currency_names, currency_weights = list(currencies), list(currencies.values())
+    city_names, city_weights = list(cities), list(cities.values())
+    year_names, year_weights = list(years), list(years.values())
+    with open(target_name, "w", newline="", encoding="utf-8-sig") as File:
+        writer = csv.writer(File)
+        writer.writerow(HEADLINES)
+        for i in range(rows_count):
+            currency = generator.choices(currency_names, currency_weights)[0]
+            salary_from = round(generator.uniform(20000, 200000) / currency_to_rub[currency], -2) or 100
+            salary_to = salary_from + round(generator.uniform(0, 100000) / currency_to_rub[currency], -2)
+            published_at = datetime(int(generator.choices(year_names, year_weights)[0]), 1, 1) \
+                + timedelta(seconds=generator.randrange(365 * 24 * 3600))
+            name = generator.choice(NAMES)
+            row = [name, f"<p>{name}: описание вакансии</p>", "Python\nSQL\nGit", "between1And3",
+                   generator.choice(["False", "True"]), f"Компания {generator.randrange(1000)}", str(salary_from),
+                   str(salary_to), generator.choice(["False", "True"]), currency,
+                   generator.choices(city_names, city_weights)[0], published_at.strftime("%Y-%m-%dT%H:%M:%S+0300")]
+            if generator.random() < invalid_share:
+                if generator.random() < 0.5:
+                    row[generator.randrange(len(row))] = ""
+                else:
+                    row.append("лишний столбец")
+            writer.writerow(row)
+
+
+def scale_csv(source_name, target_name, rows_count, short_text=True):
+    """Создаёт увеличенную копию файла, повторяя его корректные строки
+    Args:
+        source_name (string): исходный файл
+        target_name (string): файл для записи
+        rows_count (int): количество строк в новом файле
+        short_text (bool): заменять ли длинные description и key_skills коротким текстом
+    """
+    with open(source_name, encoding="utf-8-sig") as File:
+        reader = csv.reader(File)
+        headlines_list = next(reader)
+        rows = [row for row in reader if len(row) == len(headlines_list) and "" not in row]
+    text_columns = [headlines_list.index(name) for name in ("description", "key_skills") if name in headlines_list]
+    if short_text:
+        for row in rows:
+            for i in text_columns:
+                row[i] = row[i][:32]
+    with open(target_name, "w", newline="", encoding="utf-8-sig") as File:
+        writer = csv.writer(File)
+        writer.writerow(headlines_list)
+        for i in range(rows_count):
+            writer.writerow(rows[i % len(rows)])
+
+
+def measure_stage(function, *args):
+    """Замеряет время этапа и, если включён tracemalloc, пиковую память сверх занятой до начала этапа
+    (пик сбрасывается перед каждым этапом, поэтому этап после самого тяжёлого тоже получает свой пик);
+    ошибка этапа записывается в результат
+    Args:
+        function (callable): функция этапа
+        *args: её аргументы
+    Returns:
+        object: результат функции (None при ошибке)
+        dict: Словарь типа {ключ-показатель : значение}
+    >>> tracemalloc.start()
+    >>> _, first = measure_stage(lambda: len(bytearray(2 ** 22)))
+    >>> _, second = measure_stage(lambda: len(bytearray(2 ** 20)))
+    >>> tracemalloc.stop()
+    >>> first["peak_memory"] >= 2 ** 22, 2 ** 20 <= second["peak_memory"] < 2 ** 22
+    (True, True)
+    >>> measure_stage(int, "x")[1]["peak_memory"] is None
+    True
+    """
+    memory = tracemalloc.is_tracing()
+    if memory:
+        tracemalloc.reset_peak()
+        memory_before = tracemalloc.get_traced_memory()[0]
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    result, error = None, None
+    try:
+        result = function(*args)
+    except Exception as exception:
+        error = f"{type(exception).__name__}: {exception}"
+    record = {"wall_time": time.perf_counter() - start, "cpu_time": time.process_time() - cpu_start,
+              "peak_memory": tracemalloc.get_traced_memory()[1] - memory_before if memory else None}
+    if error is not None:
+        record["error"] = error
+    return result, record
+
+
+def aggregate_objects(dataset):
+    """Повторяет подсчёт словарей по списку объектов Vacancy"""
+    dataset.get_vacancies_count_by_years()
+    dataset.get_vacancies_count_by_years_for_profession()
+    dataset.get_salary_by_years()
+    dataset.get_salary_by_years_for_profession()
+    dataset.get_vacancies_count_by_cities()
+    dataset.get_vacancies_share_by_cities()
+    dataset.get_salary_by_cities()
+
+
+def aggregate(dataset):
+    """Повторяет подсчёт статистики по уже загруженным данным (в режимах, которые хранят вакансии)"""
+    if dataset.mode == "objects":
+        aggregate_objects(dataset)
+    elif dataset.mode == "columnar":
+        dataset.columns.get_statistics(dataset.profession)
+
+
+def split_file(file_name, directory):
+    """Разбивает файл по годам скриптом 3.2.1.py
+    Args:
+        file_name (string): название файла
+        directory (string): папка для частей
+    Returns:
+        list: список частей
+    """
+    spec = importlib.util.spec_from_file_location("splitter", os.path.join(os.path.dirname(__file__), "3.2.1.py"))
+    splitter = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(splitter)
+    return splitter.split_file(file_name, directory)
+
+
+def benchmark_stages(file_name, profession, modes, stages=STAGES, trace_memory=False):
+    """Замеряет этапы обработки файла: разбиение, разбор, загрузку и подсчёт в каждом режиме, Excel, диаграммы и pdf.
+    Этап excel_full сравнивает обычный и write_only Excel на таблице по всем городам. Набор данных загружается
+    всегда (он нужен остальным этапам), но в результаты попадает только при этапе dataset или при ошибке загрузки;
+    скорость в вакансиях в секунду указывается только для этапов parse, dataset и aggregate
+    Args:
+        file_name (string): название файла
+        profession (string): профессия
+        modes (list): режимы DataSet
+        stages (tuple): этапы для замера
+        trace_memory (bool): замерять ли пиковую память этапов через tracemalloc (замедляет этапы)
+    Returns:
+        dict: Словарь типа {ключ-этап : значение-показатели}
+    """
+    results = {}
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    with tempfile.TemporaryDirectory() as directory:
+        if "split" in stages:
+            _, results["split"] = measure_stage(split_file, file_name, os.path.join(directory, "new_files"))
+        report = None
+        for mode in modes:
+            dataset, record = measure_stage(DataSet, file_name, profession, mode)
+            if "dataset" in stages or dataset is None:
+                results[f"dataset.{mode}"] = record
+            if dataset is None:
+                continue
+            if "parse" in stages and "parse" not in results:
+                rows_count, results["parse"] = measure_stage(lambda: sum(1 for _ in dataset.csv_stream()))
+                results["parse"]["rows_count"] = rows_count
+            if "aggregate" in stages and mode in ("objects", "columnar"):
+                _, results[f"aggregate.{mode}"] = measure_stage(aggregate, dataset)
+            if report is None:
+                report = Report(dataset, directory, full_cities="excel_full" in stages)
+        if report is not None:
+            if "excel_full" in stages:
+                _, results["excel_full.write_only"] = measure_stage(report.export_excel)
+                report.cities_list_columns = report.full_cities_list_columns
+                report.cities_list_widths = report.full_cities_list_widths
+                _, results["excel_full.legacy"] = measure_stage(report.generate_excel)
+                results["excel_full.legacy"]["cities_count"] = len(report.full_cities_list_columns[0])
+                report = Report(dataset, directory)
+            if "excel" in stages:
+                _, results["excel.write_only"] = measure_stage(report.export_excel)
+            for stage, function in (("excel", report.generate_excel), ("charts", report.generate_image),
+                                    ("pdf", report.generate_pdf)):
+                if stage in stages:
+                    _, results[stage] = measure_stage(function)
+    if started_tracing:
+        tracemalloc.stop()
+    rows_count = results.get("parse", {}).get("rows_count")
+    if rows_count:
+        for stage, record in results.items():
+            if stage.split(".")[0] in ("parse", "dataset", "aggregate"):
+                record["rows_per_second"] = rows_count / record["wall_time"] if record["wall_time"] else None
+    return results
+
+
+def get_commit():
+    """Возвращает текущий коммит git или None, если его не удалось определить"""
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_synthetic_file(rows_count, generator_options, directory="."):
+    """Возвращает синтетический файл нужного размера, создавая его, если файла с такими параметрами ещё нет
+    Args:
+        rows_count (int): количество вакансий
+        generator_options (dict): параметры generate_csv
+        directory (string): папка для синтетических файлов
+    Returns:
+        string: название файла
+    """
+    options_hash = hashlib.blake2b(json.dumps(generator_options, sort_keys=True).encode(), digest_size=4).hexdigest()
+    file_name = os.path.join(directory, f"vacancies_synthetic_{rows_count}_{options_hash}.csv")
+    if not os.path.exists(file_name):
+        generate_csv(file_name, rows_count, **generator_options)
+    return file_name
+
+
+def run_benchmarks(sizes, profession, modes, stages, generator_options, directory=".", trace_memory=False):
+    """Создаёт синтетические файлы нужных размеров и замеряет на них этапы обработки
+    Args:
+        sizes (list): количества вакансий
+        profession (string): профессия
+        modes (list): режимы DataSet
+        stages (tuple): этапы для замера
+        generator_options (dict): параметры generate_csv
+        directory (string): папка для синтетических файлов
+        trace_memory (bool): замерять ли пиковую память этапов через tracemalloc
+    Returns:
+        dict: результаты для записи в JSON
+    """
+    results = {"commit": get_commit(), "python": platform.python_version(), "platform": platform.platform(),
+               "date": datetime.now().isoformat(timespec="seconds"), "profession": profession,
+               "generator": generator_options, "runs": []}
+    for rows_count in sizes:
+        file_name = get_synthetic_file(rows_count, generator_options, directory)
+        stage_results = benchmark_stages(file_name, profession, modes, stages, trace_memory)
+        results["runs"].append({"rows": rows_count, "file_size": os.path.getsize(file_name), "stages": stage_results})
+        for stage, record in stage_results.items():
+            memory = f", +{record['peak_memory'] / 2 ** 20:.1f} МБ" if record["peak_memory"] is not None else ""
+            print(f"{rows_count} {stage}: {record['wall_time']:.3f} с{memory}", record.get("error", ""))
+    return results
+
+
+def compare_results(old_name, new_name):
+    """Выводит отношение времени этапов двух файлов результатов (например, двух коммитов)
+    Args:
+        old_name (string): файл результатов до изменений
+        new_name (string): файл результатов после изменений
+    """
+    with open(old_name, encoding="utf-8") as File:
+        old = {run["rows"]: run["stages"] for run in json.load(File)["runs"]}
+    with open(new_name, encoding="utf-8") as File:
+        new = {run["rows"]: run["stages"] for run in json.load(File)["runs"]}
+    for rows_count in sorted(old.keys() & new.keys()):
+        for stage in old[rows_count].keys() & new[rows_count].keys():
+            old_time, new_time = old[rows_count][stage]["wall_time"], new[rows_count][stage]["wall_time"]
+            print(f"{rows_count} {stage}: {old_time:.3f} с -> {new_time:.3f} с ({old_time / new_time:.2f}x)")
+
+
+def get_peak_rss():
+    """Возвращает пиковую память (RSS) текущего процесса в байтах. В Linux ru_maxrss считается в килобайтах,
+    в macOS - в байтах, а в Windows модуля resource нет, и пик берётся из GetProcessMemoryInfo
+    Returns:
+        int: пиковая память процесса в байтах
+    >>> get_peak_rss() > 0
+    True
+    """
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + \
+                [(name, ctypes.c_size_t) for name in ("PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage",
+                                                      "QuotaPagedPoolUsage", "QuotaPeakNonPagedPoolUsage",
+                                                      "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage")]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters),
+                                                 counters.cb)
+        return counters.PeakWorkingSetSize
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def load_peak_rss(file_name, profession, mode):
+    """Загружает DataSet и возвращает пиковую память процесса (выполняется в отдельном процессе)
+    Args:
+        file_name (string): название файла
+        profession (string): профессия
+        mode (string): режим DataSet
+    Returns:
+        int: количество загруженных вакансий
+        int: пиковая память процесса до загрузки в байтах
+        int: пиковая память процесса после загрузки в байтах
+    """
+    rss_before = get_peak_rss()
+    dataset = DataSet(file_name, profession, mode)
+    rss_after = get_peak_rss()
+    rows_count = len(dataset.vacancies_objects) if mode == "objects" else dataset.statistics.rows_count
+    return rows_count, rss_before, rss_after
+
+
+def benchmark_memory(file_name, profession, modes):
+    """Замеряет пиковую память (RSS) загрузки в разных режимах DataSet, каждый режим - в новом процессе
+    Args:
+        file_name (string): название файла
+        profession (string): профессия
+        modes (list): режимы DataSet
+    """
+    context = multiprocessing.get_context("spawn")
+    for mode in modes:
+        with context.Pool(1) as pool:
+            rows_count, rss_before, rss_after = pool.apply(load_peak_rss, (file_name, profession, mode))
+        per_million = (rss_after - rss_before) / max(rows_count, 1) * 1_000_000
+        print(f"{mode}: пиковая память {rss_after / 2 ** 20:.1f} МБ, "
+              f"{per_million / 2 ** 20:.1f} МБ на миллион вакансий")
+
+
+def benchmark_charts(file_name, profession, iterations, directory="."):
+    """Рисует диаграммы отчёта много раз подряд и выводит пиковую память процесса: при освобождении фигур
+    она перестаёт расти после первых итераций
+    Args:
+        file_name (string): название файла
+        profession (string): профессия
+        iterations (int): количество повторов
+        directory (string): папка для изображения
+    """
+    report = Report(DataSet(file_name, profession, "columnar"), directory)
+    checkpoint = max(iterations // 10, 1)
+    start = time.perf_counter()
+    for i in range(1, iterations + 1):
+        report.generate_image()
+        if i % checkpoint == 0 or i == 1:
+            print(f"{i}: пиковая память {get_peak_rss() / 2 ** 20:.1f} МБ, "
+                  f"{(time.perf_counter() - start) / i:.3f} с на изображение")
+
+
+def benchmark_startup(file_name, profession, repeats=5):
+    """Замеряет время запуска новых процессов Python: импорт main, вывод статистики (--stats) и для сравнения
+    импорт библиотек отчётов; выводит медиану по repeats запускам и загруженные при импорте main библиотеки
+    Args:
+        file_name (string): название файла
+        profession (string): профессия
+        repeats (int): количество запусков каждой команды
+    Returns:
+        dict: Словарь типа {ключ-команда : значение-медиана времени в секундах}
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    commands = {"python": [sys.executable, "-c", "pass"],
+                "import main": [sys.executable, "-c", "import main"],
+                "stats": [sys.executable, "main.py", os.path.abspath(file_name), "-p", profession, "--stats"],
+                "import report libraries": [sys.executable, "-c", "import matplotlib.figure, openpyxl, jinja2, pdfkit"]}
+    results = {}
+    for name, command in commands.items():
+        times = []
+        for i in range(repeats):
+            start = time.perf_counter()
+            subprocess.run(command, cwd=directory, check=True, stdout=subprocess.DEVNULL)
+            times.append(time.perf_counter() - start)
+        results[name] = sorted(times)[len(times) // 2]
+        print(f"{name}: {results[name]:.3f} с")
+    loaded = subprocess.run([sys.executable, "-c", "import sys, main; print(' '.join(name for name in "
+                             "('matplotlib', 'openpyxl', 'jinja2', 'pdfkit') if name in sys.modules))"],
+                            cwd=directory, check=True, capture_output=True, text=True).stdout.strip()
+    print(f"библиотеки отчётов после import main: {loaded or 'нет'}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Замеры производительности обработки файла вакансий")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000], help="размеры синтетических файлов")
+    parser.add_argument("--source", help="увеличить этот файл вместо создания синтетического")
+    parser.add_argument("--directory", default=".", help="папка для создаваемых файлов")
+    parser.add_argument("--profession", default="Программист", help="профессия")
+    parser.add_argument("--modes", nargs="+", default=["objects", "streaming", "columnar"], help="режимы DataSet")
+    parser.add_argument("--stages", nargs="+", default=list(STAGES), choices=STAGES, help="этапы для замера")
+    parser.add_argument("--currencies", default=CURRENCIES_MIX, help="распределение валют")
+    parser.add_argument("--cities", default=CITIES_MIX, help="распределение городов")
+    parser.add_argument("--years", default=YEARS_MIX, help="распределение или диапазон годов")
+    parser.add_argument("--invalid-share", type=float, default=0.1, help="доля некорректных строк")
+    parser.add_argument("--seed", type=int, default=0, help="начальное значение генератора")
+    parser.add_argument("--extra-cities", type=int, default=0, help="количество дополнительных редких городов")
+    parser.add_argument("--output", default="benchmark_results.json", help="файл для результатов в JSON")
+    parser.add_argument("--memory", action="store_true", help="замерить пиковую память загрузки в отдельных процессах")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="замерять пиковую память каждого этапа через tracemalloc (замедляет этапы)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="сравнить два файла результатов")
+    parser.add_argument("--startup", type=int, metavar="N", help="замерить запуск процессов, N запусков на команду")
+    parser.add_argument("--charts", type=int, metavar="N", help="нарисовать диаграммы N раз и вывести пиковую память")
+    args = parser.parse_args()
+    if args.compare:
+        compare_results(*args.compare)
+    elif args.startup:
+        benchmark_startup(args.source or "vacancies.csv", args.profession, args.startup)
+    elif args.charts:
+        with tempfile.TemporaryDirectory() as directory:
+            benchmark_charts(args.source or "vacancies.csv", args.profession, args.charts, directory)
+    elif args.source:
+        for rows in args.rows:
+            file_name = os.path.join(args.directory, f"vacancies_scaled_{rows}.csv")
+            scale_csv(args.source, file_name, rows)
+            if args.memory:
+                benchmark_memory(file_name, args.profession, args.modes)
+                continue
+            stage_results = benchmark_stages(file_name, args.profession, args.modes, ("dataset", "aggregate"))
+            for stage, record in stage_results.items():
+                print(f"{rows} {stage}: {record['wall_time']:.3f} с")
+    else:
+        options = {"currencies": args.currencies, "cities": args.cities, "years": args.years,
+                   "invalid_share": args.invalid_share, "seed": args.seed, "extra_cities": args.extra_cities}
+        if args.memory:
+            for rows in args.rows:
+                benchmark_memory(get_synthetic_file(rows, options, args.directory), args.profession, args.modes)
+        else:
+            results = run_benchmarks(args.rows, args.profession, args.modes, args.stages, options, args.directory,
+                                     args.trace_memory)
+            with open(args.output, "w", encoding="utf-8") as File:
+                json.dump(results, File, ensure_ascii=False, indent=2)
@@ -1,13 +1,27 @@
-import matplotlib.pyplot as plt
 import numpy as np
+import argparse
+import bisect
+import copy
+import cProfile
 import csv
+import functools
+import hashlib
+import io
+import json
+import logging
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from glob import glob
+from itertools import chain, islice, repeat
 from operator import itemgetter
-import openpyxl
-from openpyxl.styles import Font, Border, Side
-from openpyxl.utils import get_column_letter
-from openpyxl.styles.numbers import FORMAT_PERCENTAGE_00, FORMAT_NUMBER_00
-from jinja2 import Environment, FileSystemLoader
-import pdfkit
+from urllib.parse import parse_qs, urlsplit
 
 currency_to_rub = {"AZN": 35.68,
                    "BYR": 23.91,
@@ -21,34 +35,314 @@ currency_to_rub = {"AZN": 35.68,
                    "UZS": 0.0055, }
 
 
-def take_ten_items(dictionary):
+DATASET_MODES = ("objects", "streaming", "columnar", "parallel", "incremental")
+VALIDATION_MODES = ("all", "needed")
+VACANCY_FIELDS = ("name", "salary_from", "salary_to", "salary_currency", "area_name", "published_at")
+PARALLEL_CHUNK_SIZE = 50000
+PARALLEL_RANGE_SIZE = 8 * 1024 * 1024
+CACHE_SUFFIX = ".cache.npz"
+PROFESSION_CACHE_SIZE = 32
+STATE_SUFFIX = ".state.json"
+STATE_HEAD_SIZE = 64 * 1024
+NAME_INDEX_NGRAM = 3
+CITY_MIN_SHARE = 0.01
+RATES_CACHE_SIZE = 8
+SALARY_QUANTILES = (0.5, 0.9)
+COLUMNS_SUFFIX = ".columns"
+INPUT_FORMATS = {".npz": "npz", COLUMNS_SUFFIX: "npy", ".parquet": "parquet", ".feather": "feather"}
+INPUT_COLUMNS = ("name_codes", "names", "salary_from", "salary_to", "currency_codes", "currencies", "city_codes",
+                 "cities", "published_at")
+SKETCH_RELATIVE_ACCURACY = 0.01
+REPORT_FORMATS = ("excel", "image", "pdf")
+REPORT_FILES = {"excel": ("report.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+                "image": ("graph.png", "image/png"),
+                "pdf": ("report.pdf", "application/pdf")}
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8000
+SERVER_MODES = ("objects", "columnar")
+CHART_FONT_SIZE = 8
+CHART_SMALL_FONT_SIZE = 6
+PDF_TEMPLATE = "pdf_template.html"
+CHART_CACHE_DIRECTORY = ".chart_cache"
+CHART_CACHE_VERSION = 2
+CHART_CACHE_SIZE = 256
+PROFILE_ENV = "VACANCIES_PROFILE"
+PROFILE_DIRECTORY_ENV = "VACANCIES_PROFILE_DIR"
+PROFILE_MEMORY_ENV = "VACANCIES_PROFILE_MEMORY"
+PROFILE_RECORDS = 100
+
+
+class StageProfiler:
+    """Замеряет этапы работы программы: время, процессорное время, пиковую память и скорость обработки вакансий.
+    Каждый замер записывается в лог "vacancies.profile" одной JSON-строкой; при заданной папке для каждого этапа
+    сохраняется файл cProfile (на время вложенного этапа профилирование внешнего приостанавливается).
+    Пиковая память считается через tracemalloc только по отдельному включению, так как трассировка
+    замедляет этапы на Python в несколько раз сильнее, чем этапы на numpy, и искажает соотношение времени
+
+    Attributes:
+        enabled (bool): включены ли замеры
+        directory (string): папка для файлов cProfile или None
+        memory (bool): замерять ли пиковую память через tracemalloc
+        records (deque): последние PROFILE_RECORDS замеров
+        logger (logging.Logger): лог для замеров
+        stack (list): для каждого выполняющегося этапа - пиковая память вложенных этапов и профилировщик
+    """
+
+    def __init__(self, enabled=False, directory=None, memory=False):
+        """Инициализируект объект StageProfiler
+        Args:
+            enabled (bool): включены ли замеры
+            directory (string): папка для файлов cProfile или None
+            memory (bool): замерять ли пиковую память через tracemalloc
+        """
+        self.enabled = False
+        self.directory = None
+        self.memory = False
+        self.records = deque(maxlen=PROFILE_RECORDS)
+        self.logger = logging.getLogger("vacancies.profile")
+        self.stack = []
+        if enabled:
+            self.enable(directory, memory)
+
+    def enable(self, directory=None, memory=False):
+        """Включает замеры
+        Args:
+            directory (string): папка для файлов cProfile или None
+            memory (bool): замерять ли пиковую память через tracemalloc
+        """
+        self.enabled = True
+        self.directory = directory
+        self.memory = memory
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if not self.logger.handlers:
+            self.logger.addHandler(logging.StreamHandler())
+            self.logger.setLevel(logging.INFO)
+
+    def stage(self, name, count_rows=None):
+        """Создаёт декоратор, замеряющий функцию как этап
+        Args:
+            name (string): название этапа
+            count_rows (callable): функция от первого аргумента этапа, возвращающая количество обработанных вакансий
+        Returns:
+            callable: декоратор
+        >>> stage_profiler = StageProfiler(enabled=True)
+        >>> stage_profiler.logger.disabled = True
+        >>> stage_profiler.stage("sum", count_rows=len)(sum)(range(1000))
+        499500
+        >>> record = stage_profiler.records[-1]
+        >>> record["stage"], record["rows"], record["peak_memory"], sorted(record)
+        ('sum', 1000, None, ['cpu_time', 'peak_memory', 'profile', 'rows', 'rows_per_second', 'stage', 'wall_time'])
+        """
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                return self.run(name, count_rows, function, args, kwargs)
+            return wrapper
+        return decorator
+
+    def run(self, name, count_rows, function, args, kwargs):
+        """Выполняет этап с замерами и записывает результат
+        Args:
+            name (string): название этапа
+            count_rows (callable): функция, возвращающая количество обработанных вакансий, или None
+            function (callable): функция этапа
+            args (tuple): позиционные аргументы
+            kwargs (dict): именованные аргументы
+        Returns:
+            object: результат функции
+        """
+        memory = self.memory and tracemalloc.is_tracing()
+        outer = self.stack[-1] if self.stack else None
+        if outer is not None:
+            if memory:
+                outer[0] = max(outer[0], tracemalloc.get_traced_memory()[1])
+            if outer[1] is not None:
+                outer[1].disable()
+        profile = cProfile.Profile() if self.directory is not None else None
+        current = [0, profile]
+        self.stack.append(current)
+        if memory:
+            tracemalloc.reset_peak()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        if profile is not None:
+            profile.enable()
+        succeeded = False
+        try:
+            result = function(*args, **kwargs)
+            succeeded = True
+            return result
+        finally:
+            if profile is not None:
+                profile.disable()
+            wall_time, cpu_time = time.perf_counter() - wall_start, time.process_time() - cpu_start
+            peak_memory = max(current[0], tracemalloc.get_traced_memory()[1]) if memory else None
+            self.stack.pop()
+            if outer is not None:
+                if memory:
+                    outer[0] = max(outer[0], peak_memory)
+                    tracemalloc.reset_peak()
+                if outer[1] is not None:
+                    outer[1].enable()
+            if succeeded:
+                self.add_record(name, count_rows, args, wall_time, cpu_time, peak_memory, profile)
+
+    def add_record(self, name, count_rows, args, wall_time, cpu_time, peak_memory, profile):
+        """Записывает замер успешно завершившегося этапа
+        Args:
+            name (string): название этапа
+            count_rows (callable): функция, возвращающая количество обработанных вакансий, или None
+            args (tuple): позиционные аргументы этапа
+            wall_time (float): время в секундах
+            cpu_time (float): процессорное время в секундах
+            peak_memory (int): пиковая память в байтах или None, если память не замеряется
+            profile (cProfile.Profile): профилировщик этапа или None
+        >>> stage_profiler = StageProfiler(enabled=True)
+        >>> stage_profiler.logger.disabled = True
+        >>> stage_profiler.stage("fail", count_rows=len)(int)("x")
+        Traceback (most recent call last):
+        ...
+        ValueError: invalid literal for int() with base 10: 'x'
+        >>> len(stage_profiler.records)
+        0
+        """
+        rows = count_rows(args[0]) if count_rows is not None and args else None
+        record = {"stage": name, "wall_time": wall_time, "cpu_time": cpu_time, "peak_memory": peak_memory,
+                  "rows": rows, "rows_per_second": rows / wall_time if rows is not None and wall_time else None,
+                  "profile": None}
+        if profile is not None:
+            record["profile"] = os.path.join(self.directory, f"{name}.{os.getpid()}.{time.time_ns()}.prof")
+            profile.dump_stats(record["profile"])
+        self.records.append(record)
+        self.logger.info(json.dumps(record, ensure_ascii=False))
+
+
+def get_env_flag(name):
+    """Читает логический флаг из переменной окружения: пустое значение, "0", "false", "no" и "off" - выключен
+    Args:
+        name (string): название переменной окружения
+    Returns:
+        bool: значение флага
+    >>> os.environ["VACANCIES_TEST_FLAG"] = "0"
+    >>> get_env_flag("VACANCIES_TEST_FLAG"), get_env_flag("VACANCIES_MISSING_FLAG")
+    (False, False)
+    >>> os.environ["VACANCIES_TEST_FLAG"] = "yes"
+    >>> get_env_flag("VACANCIES_TEST_FLAG")
+    True
+    """
+    return os.environ.get(name, "").strip().lower() not in ("", "0", "false", "no", "off")
+
+
+profiler = StageProfiler(get_env_flag(PROFILE_ENV), os.environ.get(PROFILE_DIRECTORY_ENV),
+                         get_env_flag(PROFILE_MEMORY_ENV))
+
+
+def take_ten_items(dictionary, count=10):
     """Берёт 10 первых пар словаря, округляя значения до 4 знаков после запятой
     Args:
         dictionary (dict): словарь
+        count (int): сколько пар взять (None - все)
     Returns:
         dict: обрезанный словарь
     >>> take_ten_items({"a": 1.45609, "b": 6.666, "c": 7, "d": 0.52723, "e": 5, "f": 4,"g": 3, "h": 2, "i": 12.4444, "j": 11, "k": 12.4433, "l": 13.3, "m": 42.094394})
     {'a': 1.4561, 'b': 6.666, 'c': 7, 'd': 0.5272, 'e': 5, 'f': 4, 'g': 3, 'h': 2, 'i': 12.4444, 'j': 11}
     >>> take_ten_items({'a': 2.3699, 'b': 4.666, 'c': 5.898989, 'd': 0.7677, 'e': 5})
     {'a': 2.3699, 'b': 4.666, 'c': 5.899, 'd': 0.7677, 'e': 5}
+    >>> len(take_ten_items({i: i for i in range(20)}, None))
+    20
     """
     new_dictionary = {}
     i = 0
     for key in dictionary:
         new_dictionary[key] = round(dictionary[key], 4)
         i += 1
-        if i == 10:
+        if i == count:
             break
     return new_dictionary
 
 
+def get_file_fingerprint(file_name):
+    """Возвращает отпечаток файла по пути, размеру и времени изменения
+    Args:
+        file_name (string): название файла
+    Returns:
+        string: отпечаток файла
+    """
+    stat = os.stat(file_name)
+    return json.dumps({"path": os.path.abspath(file_name), "size": stat.st_size, "mtime": stat.st_mtime_ns})
+
+
+def get_file_hash(file_name, size=None):
+    """Возвращает хэш содержимого файла
+    Args:
+        file_name (string): название файла
+        size (int): количество байт от начала файла, по которым считается хэш (по умолчанию - весь файл)
+    Returns:
+        string: хэш в шестнадцатеричном виде
+    """
+    content_hash = hashlib.blake2b()
+    with open(file_name, "rb") as File:
+        if size is not None:
+            content_hash.update(File.read(size))
+            return content_hash.hexdigest()
+        for block in iter(lambda: File.read(1024 * 1024), b""):
+            content_hash.update(block)
+    return content_hash.hexdigest()
+
+
+def project_rows(rows, headlines_list, validation="all"):
+    """Отбрасывает некорректные строки и оставляет в остальных только поля VACANCY_FIELDS
+    Args:
+        rows (iterable): строки файла без заголовков
+        headlines_list (list): заголовки файла
+        validation (string): какие поля строки должны быть непустыми ("all" - все, "needed" - только VACANCY_FIELDS)
+    Yields:
+        tuple: значения полей VACANCY_FIELDS
+    >>> headlines = ["name", "description", "salary_from", "salary_to", "salary_currency", "area_name", "published_at"]
+    >>> rows = [["Программист", "", "10", "20", "RUR", "Сургут", "2020"], ["Аналитик", "текст", "10", "20", "RUR", "Пермь", "2021"]]
+    >>> list(project_rows(rows, headlines))
+    [('Аналитик', '10', '20', 'RUR', 'Пермь', '2021')]
+    >>> len(list(project_rows(rows, headlines, "needed")))
+    2
+    """
+    length = len(headlines_list)
+    project = itemgetter(*(headlines_list.index(field) for field in VACANCY_FIELDS))
+    if validation == "all":
+        for row in rows:
+            if len(row) == length and "" not in row:
+                yield project(row)
+    else:
+        for row in rows:
+            if len(row) == length:
+                values = project(row)
+                if "" not in values:
+                    yield values
+
+
 class DataSet:
     """Составляет базу данных для вакансий.
 
     Attributes:
         file_name (string): название файла
         profession (string): название профессии
+        mode (string): режим загрузки ("objects" - список объектов Vacancy, "streaming" - один проход без хранения вакансий,
+            "columnar" - столбцы в массивах numpy, "parallel" - обработка частей файла в нескольких процессах,
+            "incremental" - дочитывание только дописанных в конец файла строк к сохранённой статистике)
+        validation (string): какие поля строки должны быть непустыми ("all" - все, "needed" - только VACANCY_FIELDS)
+        rates_file (string): файл курсов валют по датам или None (курсы из currency_to_rub)
+        currency_rates (CurrencyRates): курсы валют из rates_file или None
+        rates_hash (string): хэш файла курсов ("" без него), по которому проверяются кэш и сохранённая статистика
+        quantiles (bool): собираются ли наброски зарплат для get_salary_quantiles (в режиме "objects" не нужны)
+        input_format (string): формат входного файла ("csv" или значение из INPUT_FORMATS)
         vacancies_objects (list): список вакансий
+        columns (VacanciesColumns): вакансии по столбцам (только в режиме "columnar")
+        name_index (NameIndex): индекс названий вакансий из vacancies_objects (только в режиме "objects")
+        statistics (VacanciesStatistics): накопленные суммы и количества (во всех режимах, кроме "objects")
+        profession_cache (OrderedDict): LRU-кэш наборов данных для других профессий, общий для всех наборов из stats_for
         vacancies_count_by_years (dict): Словарь типа {ключ-год : значение-количество вакансий}
         vacancies_count_by_years_for_profession (dict): Словарь типа {ключ-год : значение-количество вакансий определённой профессии}
         salary_by_years (dict): Словарь типа {ключ-год : значение-уровень зарплат}
@@ -58,23 +352,89 @@ class DataSet:
         salary_by_cities (dict): Словарь типа {ключ-город : значение-уровень зарплат}
     """
 
-    def __init__(self, file_name, profession):
+    @profiler.stage("DataSet.__init__", count_rows=lambda dataset: dataset.get_rows_count())
+    def __init__(self, file_name, profession, mode="objects", workers=None, cache=False, validation="all",
+                 rates_file=None, quantiles=False):
         """Инициализируект объект DataSet, создаёт различные словари
         Args:
-            file_name (string): название файла
+            file_name (string): название файла: CSV, столбцы из convert_file (.npz, папка .columns, .parquet,
+                .feather) или, в режиме "parallel", папка с частями CSV файла
             profession (string): профессия
+            mode (string): режим загрузки, один из DATASET_MODES
+            workers (int): количество процессов для режима "parallel" (по умолчанию - по числу ядер)
+            cache (bool): хранить ли разобранные столбцы в файле кэша рядом с исходным (только в режиме "columnar")
+            validation (string): какие поля строки должны быть непустыми, один из VALIDATION_MODES
+            rates_file (string): CSV файл курсов валют по датам (см. CurrencyRates.load)
+            quantiles (bool): собирать ли наброски зарплат для get_salary_quantiles
         >>> type(DataSet("vacancies.csv", "Программист")).__name__
         'DataSet'
         >>> DataSet("vacancies.csv", "Программист").file_name
         'vacancies.csv'
         >>> DataSet("vacancies.csv", "Программист").profession
         'Программист'
+        >>> DataSet("vacancies.csv", "Программист", "streaming").salary_by_cities == DataSet("vacancies.csv", "Программист").salary_by_cities
+        True
+        >>> DataSet("vacancies.csv", "Программист", "streaming").vacancies_objects
+        []
+        >>> DataSet("vacancies.csv", "Программист", "columnar").salary_by_years == DataSet("vacancies.csv", "Программист").salary_by_years
+        True
+        >>> import tempfile
+        >>> with tempfile.TemporaryDirectory() as directory:
+        ...     file_name = shutil.copy("vacancies.csv", directory)
+        ...     incremental = [DataSet(file_name, "Программист", "incremental").salary_by_cities for i in range(2)]
+        ...     state_files = [name for name in os.listdir(directory) if name.endswith(STATE_SUFFIX)]
+        >>> incremental[0] == incremental[1] == DataSet("vacancies.csv", "Программист").salary_by_cities, state_files
+        (True, ['vacancies.csv.Программист.state.json'])
+        >>> len(DataSet("vacancies.csv", "Программист", validation="needed").vacancies_objects)
+        99
+        >>> with tempfile.TemporaryDirectory() as directory:
+        ...     file_name = shutil.copy("vacancies.csv", directory)
+        ...     cached = [DataSet(file_name, "Программист", "columnar", cache=True).salary_by_cities for i in range(2)]
+        ...     cache_files = [name for name in os.listdir(directory) if name.endswith(CACHE_SUFFIX)]
+        >>> cached[0] == cached[1] == DataSet("vacancies.csv", "Программист").salary_by_cities, cache_files
+        (True, ['vacancies.csv.cache.npz'])
         """
+        if mode not in DATASET_MODES:
+            raise ValueError(f"Неизвестный режим загрузки: {mode}")
+        if validation not in VALIDATION_MODES:
+            raise ValueError(f"Неизвестный режим проверки строк: {validation}")
+        self.input_format = get_input_format(file_name)
+        if mode == "incremental" and self.input_format != "csv":
+            raise ValueError("Режим incremental поддерживает только CSV файлы")
         self.file_name = file_name
         self.profession = profession
-        headlines, vacancies = self.csv_reader()
-        dictionaries = self.csv_filer(vacancies, headlines)
-        self.vacancies_objects = [Vacancy(dictionary) for dictionary in dictionaries]
+        self.mode = mode
+        self.validation = validation
+        self.rates_file = rates_file
+        self.quantiles = quantiles
+        self.currency_rates = get_currency_rates(rates_file) if rates_file is not None else None
+        self.rates_hash = get_file_hash(rates_file) if rates_file is not None else ""
+        self.profession_cache = OrderedDict()
+        if mode == "streaming":
+            self.vacancies_objects = []
+            self.set_statistics(self.get_streaming_statistics())
+            return
+        if mode == "columnar":
+            self.vacancies_objects = []
+            if self.input_format != "csv":
+                self.columns = VacanciesColumns.from_input(load_input_columns(file_name, self.input_format),
+                                                           self.currency_rates)
+            elif cache:
+                self.columns = self.get_cached_columns()
+            else:
+                self.columns = VacanciesColumns.from_rows(self.csv_stream(), self.currency_rates)
+            self.set_statistics(self.columns.get_statistics(profession, quantiles))
+            return
+        if mode == "parallel":
+            self.vacancies_objects = []
+            self.set_statistics(self.get_parallel_statistics(workers))
+            return
+        if mode == "incremental":
+            self.vacancies_objects = []
+            self.set_statistics(self.get_incremental_statistics())
+            return
+        self.vacancies_objects = [Vacancy.from_row(row, self.currency_rates) for row in self.csv_stream()]
+        self.name_index = NameIndex(vacancy.name for vacancy in self.vacancies_objects)
         self.vacancies_count_by_years = self.get_vacancies_count_by_years()
         self.vacancies_count_by_years_for_profession = self.get_vacancies_count_by_years_for_profession()
         self.salary_by_years = self.get_salary_by_years()
@@ -83,58 +443,220 @@ class DataSet:
         self.vacancies_share_by_cities = self.get_vacancies_share_by_cities()
         self.salary_by_cities = self.get_salary_by_cities()
 
-    def csv_reader(self):
-        """Создаёт список вакансий и список их параметров
+    def get_rows_count(self):
+        """Возвращает количество учтённых вакансий
         Returns:
-            list: список параметров вакансий
-            list: список вакансий
+            int: количество вакансий
+        """
+        if self.mode == "objects":
+            return len(self.vacancies_objects)
+        return self.statistics.rows_count
+
+    def csv_stream(self):
+        """Построчно читает файл, не храня его в памяти, и оставляет в корректных строках только поля VACANCY_FIELDS.
+        Файл в одном из INPUT_FORMATS отдаётся теми же кортежами по столбцам
+        Yields:
+            tuple: значения полей VACANCY_FIELDS очередной корректной вакансии
         """
-        headlines_list = []
-        vacancies_list = []
-        length = 0
-        first_element = True
-        rows_count = 0
+        if self.input_format != "csv":
+            yield from iter_input_rows(load_input_columns(self.file_name, self.input_format))
+            return
         with open(self.file_name, encoding="utf-8-sig") as File:
             reader = csv.reader(File)
-            for row in reader:
-                rows_count += 1
-                if first_element:
-                    headlines_list = row
-                    length = len(row)
-                    first_element = False
-                else:
-                    need_to_break = False
-                    if length != len(row):
-                        need_to_break = True
-                    for word in row:
-                        if word == "":
-                            need_to_break = True
-                    if need_to_break:
+            headlines_list = next(reader, None)
+            if headlines_list is None:
+                print("Пустой файл")
+                exit()
+            first_row = next(reader, None)
+            if first_row is None:
+                print("Нет данных")
+                exit()
+            yield from project_rows(chain([first_row], reader), headlines_list, self.validation)
+
+    def get_derived_file_name(self, suffix, profession=None):
+        """Возвращает название служебного файла рядом с исходным
+        Args:
+            suffix (string): окончание названия (CACHE_SUFFIX или STATE_SUFFIX)
+            profession (string): профессия, если файл относится к одной профессии
+        Returns:
+            string: название файла
+        >>> DataSet("vacancies.csv", "Программист", "streaming", validation="needed").get_derived_file_name(STATE_SUFFIX, "Программист")
+        'vacancies.csv.Программист.needed.state.json'
+        """
+        parts = [self.file_name]
+        if profession is not None:
+            parts.append(get_safe_file_name(profession))
+        if self.validation != "all":
+            parts.append(self.validation)
+        if self.rates_file is not None:
+            parts.append(get_safe_file_name(os.path.basename(self.rates_file)))
+        return ".".join(parts) + suffix
+
+    def get_streaming_statistics(self):
+        """Собирает статистику за один проход по файлу
+        Returns:
+            VacanciesStatistics: накопленная статистика
+        """
+        statistics = VacanciesStatistics(self.profession, self.quantiles)
+        for row in self.csv_stream():
+            statistics.add_vacancy(Vacancy.from_row(row, self.currency_rates))
+        return statistics
+
+    def csv_chunks(self, size):
+        """Разбивает поток вакансий на части, оставляя только нужные для Vacancy поля
+        Args:
+            size (int): количество вакансий в части
+        Yields:
+            list: список кортежей значений полей VACANCY_FIELDS
+        """
+        chunk = []
+        for row in self.csv_stream():
+            chunk.append(row)
+            if len(chunk) == size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def get_parallel_statistics(self, workers=None):
+        """Собирает статистику в нескольких процессах и объединяет её.
+        Папка обрабатывается по файлам *.csv (например, по годам из 3.2.1.py), один CSV файл - диапазонами
+        байтов примерно по PARALLEL_RANGE_SIZE, которые каждый процесс читает и разбирает сам,
+        а файл в одном из INPUT_FORMATS - частями по PARALLEL_CHUNK_SIZE вакансий.
+        Args:
+            workers (int): количество процессов
+        Returns:
+            VacanciesStatistics: объединённая статистика
+        """
+        workers = workers or os.cpu_count()
+        statistics = VacanciesStatistics(self.profession, self.quantiles)
+        with ProcessPoolExecutor(workers) as executor:
+            if os.path.isdir(self.file_name) and self.input_format == "csv":
+                shards = sorted(glob(os.path.join(self.file_name, "*.csv")))
+                for shard_statistics in executor.map(get_shard_statistics, shards, repeat(self.profession),
+                                                         repeat(self.validation), repeat(self.rates_file),
+                                                         repeat(self.quantiles)):
+                    statistics.merge(shard_statistics)
+                return statistics
+            if self.input_format == "csv":
+                headlines_list, ranges = get_record_ranges(self.file_name, PARALLEL_RANGE_SIZE)
+                if headlines_list is None:
+                    print("Пустой файл")
+                    exit()
+                if not ranges:
+                    print("Нет данных")
+                    exit()
+                starts, ends = zip(*ranges)
+                for range_statistics in executor.map(get_range_statistics, repeat(self.file_name), starts, ends,
+                                                         repeat(headlines_list), repeat(self.profession),
+                                                         repeat(self.validation), repeat(self.rates_file),
+                                                         repeat(self.quantiles)):
+                    statistics.merge(range_statistics)
+                return statistics
+            futures = deque()
+            for chunk in self.csv_chunks(PARALLEL_CHUNK_SIZE):
+                futures.append(executor.submit(get_chunk_statistics, chunk, self.profession, self.rates_file,
+                                               self.quantiles))
+                if len(futures) > 2 * workers:
+                    statistics.merge(futures.popleft().result())
+            while futures:
+                statistics.merge(futures.popleft().result())
+        return statistics
+
+    def get_cached_columns(self):
+        """Загружает столбцы из кэша, а если он отсутствует или устарел - разбирает файл и обновляет кэш
+        Returns:
+            VacanciesColumns: вакансии по столбцам
+        """
+        cache_name = self.get_derived_file_name(CACHE_SUFFIX)
+        columns = VacanciesColumns.load(cache_name, self.file_name, self.rates_hash)
+        if columns is None:
+            fingerprint = get_file_fingerprint(self.file_name)
+            content_hash = get_file_hash(self.file_name)
+            columns = VacanciesColumns.from_rows(self.csv_stream(), self.currency_rates)
+            columns.save(cache_name, fingerprint, content_hash, self.rates_hash)
+        return columns
+
+    def get_incremental_statistics(self):
+        """Дочитывает строки, дописанные после последнего запуска, и обновляет сохранённую статистику.
+        Статистика хранится для каждой профессии в отдельном файле вместе с позицией, до которой прочитан файл;
+        если файл стал короче, изменилось его начало или файл курсов, статистика собирается заново.
+        В сохранённую статистику попадают только законченные записи (последняя строка записи оканчивается переводом
+        строки и не находится внутри кавычек). Последняя строка файла без перевода строки вне кавычек учитывается
+        только в возвращаемой статистике, так что если она дописана не до конца, следующий запуск прочитает её заново
+        Returns:
+            VacanciesStatistics: статистика по всему файлу
+        """
+        state_name = self.get_derived_file_name(STATE_SUFFIX, self.profession)
+        state = None
+        if os.path.exists(state_name):
+            with open(state_name, encoding="utf-8") as File:
+                state = json.load(File)
+            if state["offset"] > os.path.getsize(self.file_name) \
+                    or state["head_hash"] != get_file_hash(self.file_name, min(state["offset"], STATE_HEAD_SIZE)) \
+                    or state.get("rates_hash", "") != self.rates_hash \
+                    or "sketches_by_years" not in state["statistics"] \
+                    or self.quantiles and not state["statistics"].get("quantiles", True):
+                state = None
+        if state is None:
+            state = {"offset": 0, "headlines": None,
+                     "statistics": VacanciesStatistics(self.profession, self.quantiles).to_dict()}
+        statistics = VacanciesStatistics.from_dict(state["statistics"])
+        with open(self.file_name, "rb") as File:
+            File.seek(state["offset"])
+            offset = [state["offset"]]
+            tail = []
+
+            def lines():
+                pending = []
+                quotes = 0
+                for line in File:
+                    pending.append(line)
+                    quotes += line.count(b'"')
+                    if not line.endswith(b"\n") or quotes % 2:
                         continue
-                    vacancies_list.append(row)
-        if rows_count == 0:
-            print("Пустой файл")
-            exit()
-        if rows_count == 1:
-            print("Нет данных")
-            exit()
-        return headlines_list, vacancies_list
-
-    def csv_filer(self, reader, list_naming):
-        """Создаёт словарь вакансий и их параметров
-        Args:
-            reader (list): список вакансий
-            list_naming (list): список параметров вакансий
-        Returns:
-            dict: словарь типа {вакансия : параметры}
-        """
-        dictionaries_list = []
-        for vacancy in reader:
-            dictionary = {}
-            for i in range(len(list_naming)):
-                dictionary[list_naming[i]] = vacancy[i]
-            dictionaries_list.append(dictionary)
-        return dictionaries_list
+                    for line in pending:
+                        text = line.decode("utf-8-sig" if offset[0] == 0 else "utf-8")
+                        offset[0] += len(line)
+                        yield text
+                    pending, quotes = [], 0
+                if quotes % 2 == 0:
+                    tail.extend(pending)
+
+            reader = csv.reader(lines())
+            headlines_list = state["headlines"]
+            if headlines_list is None:
+                headlines_list = next(reader, None)
+                if headlines_list is None:
+                    print("Пустой файл")
+                    exit()
+            for row in project_rows(reader, headlines_list, self.validation):
+                statistics.add_vacancy(Vacancy.from_row(row, self.currency_rates))
+        state = {"offset": offset[0], "head_hash": get_file_hash(self.file_name, min(offset[0], STATE_HEAD_SIZE)),
+                 "rates_hash": self.rates_hash, "headlines": headlines_list, "statistics": statistics.to_dict()}
+        temporary_name = f"{state_name}.{os.getpid()}.tmp"
+        with open(temporary_name, "w", encoding="utf-8") as File:
+            json.dump(state, File, ensure_ascii=False)
+        os.replace(temporary_name, state_name)
+        if tail:
+            tail_text = b"".join(tail).decode("utf-8", errors="replace")
+            for row in project_rows(csv.reader([tail_text]), headlines_list, self.validation):
+                statistics.add_vacancy(Vacancy.from_row(row, self.currency_rates))
+        return statistics
+
+    def set_statistics(self, statistics):
+        """Заполняет словари статистики из накопленных сумм и количеств
+        Args:
+            statistics (VacanciesStatistics): накопленная статистика
+        """
+        self.statistics = statistics
+        self.vacancies_count_by_years = statistics.get_vacancies_count_by_years()
+        self.vacancies_count_by_years_for_profession = statistics.get_vacancies_count_by_years_for_profession()
+        self.salary_by_years = statistics.get_salary_by_years()
+        self.salary_by_years_for_profession = statistics.get_salary_by_years_for_profession()
+        self.vacancies_count_by_cities = statistics.get_vacancies_count_by_cities()
+        self.vacancies_share_by_cities = statistics.get_vacancies_share_by_cities()
+        self.salary_by_cities = statistics.get_salary_by_cities()
 
     def get_vacancies_count_by_years(self):
         """
@@ -158,9 +680,7 @@ class DataSet:
             dict: Словарь типа {ключ-год : значение-количество вакансий определённой профессии}
         """
         dictionary = {}
-        for vacancy in self.vacancies_objects:
-            if self.profession not in vacancy.name:
-                continue
+        for vacancy in self.get_profession_vacancies():
             if vacancy.published_at in dictionary:
                 dictionary[vacancy.published_at] += 1
             else:
@@ -170,6 +690,14 @@ class DataSet:
             dictionary = {2022: 0}
         return dictionary
 
+    def get_profession_vacancies(self):
+        """
+        Возвращает вакансии, в названии которых есть профессия, в порядке следования в файле
+        Returns:
+            list: список вакансий определённой профессии
+        """
+        return [self.vacancies_objects[i] for i in self.name_index.find(self.profession)]
+
     def get_salary_by_years(self):
         """
         Возвращает словарь годов и уровня зарплат
@@ -194,9 +722,7 @@ class DataSet:
             dict: Словарь типа {ключ-год : значение-уровень зарплат определённой профессии}
         """
         dictionary = {}
-        for vacancy in self.vacancies_objects:
-            if self.profession not in vacancy.name:
-                continue
+        for vacancy in self.get_profession_vacancies():
             if vacancy.published_at in dictionary:
                 dictionary[vacancy.published_at] += vacancy.salary
             else:
@@ -222,29 +748,35 @@ class DataSet:
                 dictionary[vacancy.area_name] = 1
         return dictionary
 
-    def get_vacancies_share_by_cities(self):
+    def get_vacancies_share_by_cities(self, min_share=CITY_MIN_SHARE, count=10):
         """
         Возвращает словарь городов и процента вакансий от общего кол-ва
+        Args:
+            min_share (float): наименьшая доля вакансий города, при которой он попадает в словарь
+            count (int): сколько городов взять (None - все)
         Returns:
             dict: Словарь типа {ключ-город : значение-процент вакансий от общего кол-ва}
         """
         dictionary = {}
         for key in self.vacancies_count_by_cities:
-            if self.vacancies_count_by_cities[key] / len(self.vacancies_objects) >= 0.01:
+            if self.vacancies_count_by_cities[key] / len(self.vacancies_objects) >= min_share:
                 dictionary[key] = self.vacancies_count_by_cities[key] / len(self.vacancies_objects)
         dictionary = dict(sorted(dictionary.items(), key=itemgetter(1), reverse=True))
-        new_dictionary = take_ten_items(dictionary)
+        new_dictionary = take_ten_items(dictionary, count)
         return new_dictionary
 
-    def get_salary_by_cities(self):
+    def get_salary_by_cities(self, min_share=CITY_MIN_SHARE, count=10):
         """
         Возвращает словарь городов и уровня зарплат
+        Args:
+            min_share (float): наименьшая доля вакансий города, при которой он попадает в словарь
+            count (int): сколько городов взять (None - все)
         Returns:
             dict: Словарь типа {ключ-город : значение-уровень зарплат}
         """
         dictionary = {}
         for vacancy in self.vacancies_objects:
-            if self.vacancies_count_by_cities[vacancy.area_name] / len(self.vacancies_objects) < 0.01:
+            if self.vacancies_count_by_cities[vacancy.area_name] / len(self.vacancies_objects) < min_share:
                 continue
             if vacancy.area_name in dictionary:
                 dictionary[vacancy.area_name] += vacancy.salary
@@ -253,9 +785,89 @@ class DataSet:
         for key in dictionary:
             dictionary[key] = int(dictionary[key] / self.vacancies_count_by_cities[key])
         dictionary = dict(sorted(dictionary.items(), key=itemgetter(1), reverse=True))
-        new_dictionary = take_ten_items(dictionary)
+        new_dictionary = take_ten_items(dictionary, count)
         return new_dictionary
 
+    def get_full_city_tables(self):
+        """
+        Возвращает словари уровня зарплат и доли вакансий по всем городам, без порога доли и обрезки до 10 городов
+        Returns:
+            dict: Словарь типа {ключ-город : значение-уровень зарплат}
+            dict: Словарь типа {ключ-город : значение-процент вакансий от общего кол-ва}
+        >>> salary_by_cities, share_by_cities = DataSet("vacancies.csv", "Программист").get_full_city_tables()
+        >>> len(salary_by_cities) == len(share_by_cities) == len(DataSet("vacancies.csv", "Программист").vacancies_count_by_cities)
+        True
+        """
+        source = self if self.mode == "objects" else self.statistics
+        return source.get_salary_by_cities(0, None), source.get_vacancies_share_by_cities(0, None)
+
+    def get_salary_quantiles(self):
+        """
+        Возвращает приближённые квантили SALARY_QUANTILES зарплат по годам, по годам для профессии и по городам.
+        В режиме "objects" наброски собираются по списку вакансий при вызове, в остальных - берутся из statistics,
+        поэтому набор данных должен быть создан с quantiles=True
+        Returns:
+            dict: Словарь типа {ключ-год : значение-список квантилей зарплат}
+            dict: Словарь типа {ключ-год : значение-список квантилей зарплат определённой профессии}
+            dict: Словарь типа {ключ-город : значение-список квантилей зарплат}
+        >>> DataSet("vacancies.csv", "Программист").get_salary_quantiles() == DataSet("vacancies.csv", "Программист", "columnar", quantiles=True).get_salary_quantiles()
+        True
+        >>> DataSet("vacancies.csv", "Программист", "columnar").get_salary_quantiles()
+        Traceback (most recent call last):
+        ...
+        ValueError: Наброски зарплат не собирались: создайте DataSet с quantiles=True
+        """
+        statistics = self.statistics if self.mode != "objects" else None
+        if statistics is not None and not statistics.quantiles:
+            raise ValueError("Наброски зарплат не собирались: создайте DataSet с quantiles=True")
+        if statistics is None:
+            statistics = VacanciesStatistics(self.profession, True)
+            for vacancy in self.vacancies_objects:
+                statistics.add_vacancy(vacancy)
+        return (statistics.get_salary_quantiles_by_years(), statistics.get_salary_quantiles_by_years_for_profession(),
+                statistics.get_salary_quantiles_by_cities())
+
+    def stats_for(self, profession):
+        """Возвращает набор данных для другой профессии, не перечитывая файл в режимах "objects" и "columnar".
+        Словари, не зависящие от профессии, общие с исходным набором; последние PROFESSION_CACHE_SIZE
+        результатов хранятся в кэше
+        Args:
+            profession (string): профессия
+        Returns:
+            DataSet: набор данных для профессии
+        >>> dataset = DataSet("vacancies.csv", "Программист", "columnar")
+        >>> dataset.stats_for("Аналитик").salary_by_years_for_profession == DataSet("vacancies.csv", "Аналитик").salary_by_years_for_profession
+        True
+        >>> dataset.stats_for("Аналитик") is dataset.stats_for("Аналитик"), dataset.stats_for("Аналитик").salary_by_cities is dataset.salary_by_cities
+        (True, True)
+        """
+        if profession == self.profession:
+            return self
+        if profession in self.profession_cache:
+            self.profession_cache.move_to_end(profession)
+            return self.profession_cache[profession]
+        if self.mode == "objects":
+            dataset = copy.copy(self)
+            dataset.profession = profession
+            dataset.vacancies_count_by_years_for_profession = dataset.get_vacancies_count_by_years_for_profession()
+            dataset.salary_by_years_for_profession = dataset.get_salary_by_years_for_profession()
+        elif self.mode == "columnar":
+            dataset = copy.copy(self)
+            dataset.profession = profession
+            dataset.statistics = self.statistics.for_profession(profession)
+            self.columns.count_profession(dataset.statistics)
+            dataset.vacancies_count_by_years_for_profession = \
+                dataset.statistics.get_vacancies_count_by_years_for_profession()
+            dataset.salary_by_years_for_profession = dataset.statistics.get_salary_by_years_for_profession()
+        else:
+            dataset = DataSet(self.file_name, profession, self.mode, validation=self.validation,
+                              rates_file=self.rates_file, quantiles=self.quantiles)
+            dataset.profession_cache = self.profession_cache
+        self.profession_cache[profession] = dataset
+        if len(self.profession_cache) > PROFESSION_CACHE_SIZE:
+            self.profession_cache.popitem(last=False)
+        return dataset
+
     def print_information(self):
         """
         Выводит в консоль статистику вакансий
@@ -270,8 +882,118 @@ class DataSet:
         print("Доля вакансий по городам (в порядке убывания): " + str(self.vacancies_share_by_cities))
 
 
+class CurrencyRates:
+    """Курсы валют к рублю по датам. Зарплата переводится по последнему курсу на дату публикации или раньше;
+    даты раньше первого курса получают самый ранний курс, а валюты без курсов - курс из currency_to_rub
+
+    Attributes:
+        dates (dict): Словарь типа {ключ-валюта : значение-список дат "ГГГГ-ММ-ДД" по возрастанию}
+        rates (dict): Словарь типа {ключ-валюта : значение-список курсов на эти даты}
+        default_rates (dict): Словарь типа {ключ-валюта : значение-курс} для валют без курсов по датам
+    """
+
+    def __init__(self, dates, rates, default_rates=currency_to_rub):
+        """Инициализируект объект CurrencyRates
+        Args:
+            dates (dict): Словарь типа {ключ-валюта : значение-список дат "ГГГГ-ММ-ДД" по возрастанию}
+            rates (dict): Словарь типа {ключ-валюта : значение-список курсов на эти даты}
+            default_rates (dict): Словарь типа {ключ-валюта : значение-курс} для валют без курсов по датам
+        """
+        self.dates = dates
+        self.rates = rates
+        self.default_rates = default_rates
+
+    @classmethod
+    def load(cls, file_name):
+        """Загружает курсы из CSV файла со столбцом date (ГГГГ-ММ или ГГГГ-ММ-ДД) и столбцом на каждую валюту,
+        где записано количество рублей за единицу валюты; пустая ячейка означает, что курса на дату нет
+        Args:
+            file_name (string): название файла
+        Returns:
+            CurrencyRates: курсы валют
+        """
+        with open(file_name, encoding="utf-8-sig") as File:
+            reader = csv.reader(File)
+            headlines_list = next(reader)
+            date_index = headlines_list.index("date")
+            rows = sorted((row[date_index] + "-01" if len(row[date_index]) == 7 else row[date_index][:10], row)
+                          for row in reader if row)
+        dates, rates = {}, {}
+        for i, currency in enumerate(headlines_list):
+            if i == date_index:
+                continue
+            known = [(date, float(row[i])) for date, row in rows if row[i]]
+            if known:
+                dates[currency] = [date for date, rate in known]
+                rates[currency] = [rate for date, rate in known]
+        return cls(dates, rates)
+
+    def get_rate(self, currency, published_at):
+        """Возвращает курс валюты на дату публикации
+        Args:
+            currency (string): валюта
+            published_at (string): дата публикации
+        Returns:
+            float: количество рублей за единицу валюты
+        >>> rates = CurrencyRates({"USD": ["2005-01-01", "2015-01-01"]}, {"USD": [28.0, 56.0]})
+        >>> rates.get_rate("USD", "2004-07-05T18:19:30+0300"), rates.get_rate("USD", "2014-12-31T18:19:30+0300"), rates.get_rate("USD", "2015-01-01T00:00:00+0300")
+        (28.0, 28.0, 56.0)
+        >>> rates.get_rate("EUR", "2015-01-01T00:00:00+0300")
+        59.9
+        """
+        if currency not in self.dates:
+            return self.default_rates[currency]
+        return self.rates[currency][max(bisect.bisect_right(self.dates[currency], published_at[:10]) - 1, 0)]
+
+    def get_rates(self, currency_codes, currencies, published):
+        """Возвращает курсы для столбца вакансий: для каждой валюты даты ищутся в таблице курсов одним
+        вызовом np.searchsorted вместо поиска по одной вакансии
+        Args:
+            currency_codes (np.ndarray): номера валют вакансий в списке currencies
+            currencies (list): различные валюты
+            published (np.ndarray): даты публикации "ГГГГ-ММ-ДД"
+        Returns:
+            np.ndarray: курсы валют на даты публикации
+        >>> rates = CurrencyRates({"USD": ["2005-01-01", "2015-01-01"]}, {"USD": [28.0, 56.0]})
+        >>> rates.get_rates(np.array([0, 1, 1, 1]), ["RUR", "USD"], np.array(["2020-01-01", "2004-01-01", "2014-12-31", "2015-01-01"])).tolist()
+        [1.0, 28.0, 28.0, 56.0]
+        """
+        result = np.empty(len(currency_codes), dtype=np.float64)
+        for code, currency in enumerate(currencies):
+            is_currency = currency_codes == code
+            if currency not in self.dates:
+                result[is_currency] = self.default_rates[currency]
+                continue
+            indexes = np.searchsorted(np.array(self.dates[currency]), published[is_currency], side="right") - 1
+            result[is_currency] = np.array(self.rates[currency], dtype=np.float64)[np.maximum(indexes, 0)]
+        return result
+
+
+def get_currency_rates(file_name):
+    """Возвращает курсы валют из файла, разбирая его один раз на процесс, пока файл не изменился
+    Args:
+        file_name (string): название файла курсов
+    Returns:
+        CurrencyRates: курсы валют
+    """
+    return load_currency_rates(file_name, get_file_fingerprint(file_name))
+
+
+@functools.lru_cache(maxsize=RATES_CACHE_SIZE)
+def load_currency_rates(file_name, fingerprint):
+    """Загружает курсы валют; результат кэшируется по отпечатку файла
+    Args:
+        file_name (string): название файла курсов
+        fingerprint (string): отпечаток файла
+    Returns:
+        CurrencyRates: курсы валют
+    """
+    return CurrencyRates.load(file_name)
+
+
 class Vacancy:
-    """Класс для вакансии
+    """Класс для вакансии. Хранит поля в __slots__ без словаря атрибутов,
+    а одинаковые названия и города - одной интернированной строкой
 
     Attributes:
         name (string): название
@@ -279,6 +1001,7 @@ class Vacancy:
         area_name (string): город
         published_at (int): дата публикации
     """
+    __slots__ = ("name", "salary", "area_name", "published_at")
 
     def __init__(self, dictionary):
         """Инициализируект объект Vacancy
@@ -295,175 +1018,1260 @@ class Vacancy:
         >>> Vacancy({"name": "Программист", "salary_from": 10000, "salary_to": 100000, "salary_currency": "RUR", "area_name": "Сургут",  "published_at": "2020-07-05T18:19:30+0300"}).published_at
         2020
         """
-        self.name = dictionary["name"]
-        self.salary = (float(dictionary["salary_from"]) + float(dictionary["salary_to"])) / 2 * currency_to_rub[
-            dictionary["salary_currency"]]
-        self.area_name = dictionary["area_name"]
-        self.published_at = int(dictionary["published_at"][:4])
+        self.fill(*(dictionary[field] for field in VACANCY_FIELDS))
+
+    @classmethod
+    def from_row(cls, row, rates=None):
+        """Создаёт объект Vacancy из кортежа значений, не создавая словарь
+        Args:
+            row (tuple): значения полей VACANCY_FIELDS
+            rates (CurrencyRates): курсы валют по датам (по умолчанию - currency_to_rub)
+        Returns:
+            Vacancy: вакансия
+        >>> Vacancy.from_row(("Программист", "10000", "100000", "RUR", "Сургут", "2020-07-05T18:19:30+0300")).salary
+        55000.0
+        >>> Vacancy.from_row(("Программист", "1000", "3000", "USD", "Сургут", "2005-07-05T18:19:30+0300"), CurrencyRates({"USD": ["2005-01-01", "2015-01-01"]}, {"USD": [28.0, 56.0]})).salary
+        56000.0
+        """
+        vacancy = cls.__new__(cls)
+        vacancy.fill(*row, rates=rates)
+        return vacancy
 
+    def fill(self, name, salary_from, salary_to, salary_currency, area_name, published_at, rates=None):
+        """Заполняет поля вакансии, переводя зарплату в рубли
+        Args:
+            name (string): название
+            salary_from (string): нижняя граница зарплаты
+            salary_to (string): верхняя граница зарплаты
+            salary_currency (string): валюта
+            area_name (string): город
+            published_at (string): дата публикации
+            rates (CurrencyRates): курсы валют по датам (по умолчанию - currency_to_rub)
+        """
+        self.name = sys.intern(name)
+        rate = currency_to_rub[salary_currency] if rates is None else rates.get_rate(salary_currency, published_at)
+        self.salary = (float(salary_from) + float(salary_to)) / 2 * rate
+        self.area_name = sys.intern(area_name)
+        self.published_at = int(published_at[:4])
 
-class Report:
-    """Класс для визуализации статистики
+
+class SalarySketch:
+    """Приближённое распределение зарплат для квантилей. Зарплата попадает в корзину с номером
+    ceil(log(зарплата) / log(gamma)), поэтому квантиль находится с относительной ошибкой не больше
+    SKETCH_RELATIVE_ACCURACY, а количество корзин растёт только логарифмически от разброса зарплат
+    и не зависит от количества вакансий. Наброски частей данных складываются без потери точности
 
     Attributes:
-        profession (string): профессия
-        years_list_headers (list): список заголовков, связынных с годами
-        years_list_columns (list): список годов и параметров, связанных с ними
-        cities_list_headers (list): список заголовков, связынных с городами
-        cities_list_columns (list): список городов и параметров, связанных с ними
-        years_list_widths (list): список ширин для таблицы по годам
-        cities_list_widths (list): список ширин для таблицы по городам
+        counts (dict): Словарь типа {ключ-номер корзины : значение-количество зарплат}
     """
+    gamma = (1 + SKETCH_RELATIVE_ACCURACY) / (1 - SKETCH_RELATIVE_ACCURACY)
+    log_gamma = math.log(gamma)
 
-    def __init__(self, dataset):
-        """Инициализируект объект Report, формирует различные данные
+    def __init__(self, counts=None):
+        """Инициализируект объект SalarySketch
         Args:
-            dat1aset (DataSet): dataset
+            counts (dict): Словарь типа {ключ-номер корзины : значение-количество зарплат}
         """
-        self.profession = dataset.profession
-        self.years_list_headers = (
-            "Год", "Средняя зарплата", f"Средняя зарплата - {profession}", "Количество вакансий",
-            f"Количество вакансий - {profession}")
-        self.years_list_columns = [[year for year in dataset.salary_by_years],
-                                   [value for value in dataset.salary_by_years.values()],
-                                   [value for value in dataset.salary_by_years_for_profession.values()],
-                                   [value for value in dataset.vacancies_count_by_years.values()],
-                                   [value for value in dataset.vacancies_count_by_years_for_profession.values()]]
+        self.counts = counts if counts is not None else {}
 
-        self.cities_list_headers = ("Город", "Уровень зарплат", "", "Город", "Доля вакансий")
-        self.cities_list_columns = [[city for city in dataset.salary_by_cities],
-                                    [value for value in dataset.salary_by_cities.values()],
-                                    ["" for i in range(len(dataset.salary_by_cities))],
-                                    [city for city in dataset.vacancies_share_by_cities],
-                                    [value for value in dataset.vacancies_share_by_cities.values()]]
-
-        self.years_list_widths = [len(header) + 2 for header in self.years_list_headers]
-        for i in range(len(self.years_list_columns)):
-            for cell in self.years_list_columns[i]:
-                self.years_list_widths[i] = max(len(str(cell)) + 2, self.years_list_widths[i])
-
-        self.cities_list_widths = [len(header) + 2 for header in self.cities_list_headers]
-        for i in range(len(self.cities_list_columns)):
-            for cell in self.cities_list_columns[i]:
-                self.cities_list_widths[i] = max(len(str(cell)) + 2, self.cities_list_widths[i])
+    @classmethod
+    def get_key(cls, salary):
+        """Возвращает номер корзины для зарплаты (зарплаты меньше рубля считаются равными рублю)
+        Args:
+            salary (float): зарплата
+        Returns:
+            int: номер корзины
+        """
+        return math.ceil(math.log(max(salary, 1)) / cls.log_gamma)
 
-    def set_border(self, ws, width, height):
-        """Устанавливает рамки для таблицы
+    @classmethod
+    def get_keys(cls, salaries):
+        """Возвращает номера корзин для столбца зарплат
         Args:
-            ws (openpyxl.Workbook()): Excel лист
-            width (float): ширина
-            height (float) высота
+            salaries (np.ndarray): зарплаты
+        Returns:
+            np.ndarray: номера корзин
         """
-        cell_range = f'A1:{get_column_letter(width)}{height}'
-        thin = Side(border_style="thin", color="000000")
-        for row in ws[cell_range]:
-            for cell in row:
-                cell.border = Border(top=thin, left=thin, right=thin, bottom=thin)
+        return np.ceil(np.log(np.maximum(salaries, 1)) / cls.log_gamma).astype(np.int64)
 
-    def clear_column(self, ws, column):
-        """Удаляет рамки для столбца таблицы
+    def add_key(self, key):
+        """Учитывает зарплату по номеру её корзины
         Args:
-            ws (openpyxl.Workbook()): Excel лист
-            column (string): буква, соответствующая столбцу
+            key (int): номер корзины
         """
-        empty = Side(border_style=None)
-        for cell in ws[column]:
-            cell.border = Border(top=empty, bottom=empty)
+        self.counts[key] = self.counts.get(key, 0) + 1
 
-    def get_vertical_chart(self, title, parameter_1, parameter_1_name, parameter_2,
-                           parameter_2_name, labels, fig, number):
-        """Создаёт вертикальную диаграмму
+    def merge(self, other):
+        """Добавляет к наброску другой набросок
         Args:
-            title (string): Название
-            parameter_1 (list): первый параметр
-            parameter_1_name (string): название первого параметра
-            parameter_2 (list): второй параметр
-            parameter_2_name (string): название втрого параметра
-            labels (list): лейблы
-            fig (plt.figure()): фигура
-            number (int): расположение графика на листе
+            other (SalarySketch): набросок другой части данных
         """
-        x = np.arange(len(labels))
-        width = 0.35
-        plt.rcParams['font.size'] = '8'
-        ax = fig.add_subplot(number)
-        ax.bar(x - width / 2, parameter_1, width, label=parameter_1_name)
-        ax.bar(x + width / 2, parameter_2, width, label=parameter_2_name)
-        ax.set_xticks(x, labels, rotation="vertical")
-        ax.grid(axis='y')
-        ax.set_title(title)
-        ax.legend()
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
 
-    def get_horizontal_chart(self, title, parameter, labels, fig):
-        """Создаёт горизонтальную диаграмму
+    def get_quantile(self, quantile):
+        """Возвращает приближённый квантиль зарплат
         Args:
-            title (string): Название
-            parameter (list): параметр
-            labels (list): лейблы
-            fig (plt.figure()): фигура
+            quantile (float): уровень квантиля от 0 до 1
+        Returns:
+            int: квантиль
+        >>> sketch = SalarySketch()
+        >>> for salary in range(1000, 102000, 1000):
+        ...     sketch.add_key(SalarySketch.get_key(salary))
+        >>> abs(sketch.get_quantile(0.5) - 51000) / 51000 <= SKETCH_RELATIVE_ACCURACY, abs(sketch.get_quantile(0.9) - 91000) / 91000 <= SKETCH_RELATIVE_ACCURACY
+        (True, True)
         """
-        plt.rcParams['font.size'] = '8'
-        ax = fig.add_subplot(223)
-        labels = [city.replace(' ', '\n').replace('-', '-\n') for city in labels]
-        y = np.arange(len(labels))
-        ax.barh(y, parameter)
-        ax.set_yticks(y, labels=labels, fontsize=6)
-        ax.grid(axis='x')
-        ax.invert_yaxis()
-        ax.set_title(title)
+        rank = round(quantile * (sum(self.counts.values()) - 1))
+        total = 0
+        for key in sorted(self.counts):
+            total += self.counts[key]
+            if total > rank:
+                break
+        return int(2 * self.gamma ** key / (self.gamma + 1))
 
-    def get_pie_chart(self, title, parameter, labels, fig):
-        """Создаёт вертикальную диаграмму
+
+def get_sketches_quantiles(sketches):
+    """Возвращает квантили SALARY_QUANTILES по словарю набросков
+    Args:
+        sketches (dict): Словарь типа {ключ : значение-набросок зарплат}
+    Returns:
+        dict: Словарь типа {ключ : значение-список квантилей зарплат}
+    """
+    return {key: [sketch.get_quantile(quantile) for quantile in SALARY_QUANTILES] for key, sketch in sketches.items()}
+
+
+class VacanciesStatistics:
+    """Накапливает суммы и количества вакансий, обновляясь по одной вакансии
+
+    Attributes:
+        profession (string): профессия
+        rows_count (int): количество учтённых вакансий
+        count_by_years (dict): Словарь типа {ключ-год : значение-количество вакансий}
+        salary_sum_by_years (dict): Словарь типа {ключ-год : значение-сумма зарплат}
+        count_by_years_for_profession (dict): Словарь типа {ключ-год : значение-количество вакансий определённой профессии}
+        salary_sum_by_years_for_profession (dict): Словарь типа {ключ-год : значение-сумма зарплат определённой профессии}
+        count_by_cities (dict): Словарь типа {ключ-город : значение-количество вакансий}
+        salary_sum_by_cities (dict): Словарь типа {ключ-город : значение-сумма зарплат}
+        sketches_by_years (dict): Словарь типа {ключ-год : значение-набросок зарплат}
+        sketches_by_years_for_profession (dict): Словарь типа {ключ-год : значение-набросок зарплат определённой профессии}
+        sketches_by_cities (dict): Словарь типа {ключ-город : значение-набросок зарплат}
+        quantiles (bool): собираются ли наброски зарплат (без них словари набросков остаются пустыми)
+    """
+
+    def __init__(self, profession, quantiles=False):
+        """Инициализируект пустой объект VacanciesStatistics
         Args:
-            title (string): Название
-            parameter (list): параметр
-            labels (list): лейблы
-            fig (plt.figure()): фигура
+            profession (string): профессия
+            quantiles (bool): собирать ли наброски зарплат для квантилей
         """
-        plt.rcParams['font.size'] = '6'
-        labels.insert(0, "Другие")
-        parameter.insert(0, 1 - sum(parameter))
-        ax = fig.add_subplot(224)
-        ax.pie(parameter, labels=labels)
-        ax.axis('equal')
-        ax.set_title(title)
-        fig.tight_layout()
-        plt.savefig('graph.png')
+        self.profession = profession
+        self.quantiles = quantiles
+        self.rows_count = 0
+        self.count_by_years = {}
+        self.salary_sum_by_years = {}
+        self.count_by_years_for_profession = {}
+        self.salary_sum_by_years_for_profession = {}
+        self.count_by_cities = {}
+        self.salary_sum_by_cities = {}
+        self.sketches_by_years = {}
+        self.sketches_by_years_for_profession = {}
+        self.sketches_by_cities = {}
 
-    def generate_excel(self):
-        """Создаёт вертикальную диаграмму
+    def add_vacancy(self, vacancy):
+        """Учитывает вакансию во всех словарях
+        Args:
+            vacancy (Vacancy): вакансия
+        >>> statistics = VacanciesStatistics("Программист")
+        >>> statistics.add_vacancy(Vacancy({"name": "Программист", "salary_from": 10000, "salary_to": 100000, "salary_currency": "RUR", "area_name": "Сургут",  "published_at": "2020-07-05T18:19:30+0300"}))
+        >>> statistics.add_vacancy(Vacancy({"name": "Аналитик", "salary_from": 20000, "salary_to": 40000, "salary_currency": "RUR", "area_name": "Сургут",  "published_at": "2021-07-05T18:19:30+0300"}))
+        >>> statistics.get_salary_by_years(), statistics.get_salary_by_years_for_profession()
+        ({2020: 55000, 2021: 30000}, {2020: 55000})
+        >>> statistics.get_salary_by_cities(), statistics.sketches_by_cities
+        ({'Сургут': 42500}, {})
+        """
+        self.rows_count += 1
+        year = vacancy.published_at
+        is_profession = self.profession in vacancy.name
+        self.count_by_years[year] = self.count_by_years.get(year, 0) + 1
+        self.salary_sum_by_years[year] = self.salary_sum_by_years.get(year, 0) + vacancy.salary
+        if is_profession:
+            self.count_by_years_for_profession[year] = self.count_by_years_for_profession.get(year, 0) + 1
+            self.salary_sum_by_years_for_profession[year] = \
+                self.salary_sum_by_years_for_profession.get(year, 0) + vacancy.salary
+        city = vacancy.area_name
+        self.count_by_cities[city] = self.count_by_cities.get(city, 0) + 1
+        self.salary_sum_by_cities[city] = self.salary_sum_by_cities.get(city, 0) + vacancy.salary
+        if self.quantiles:
+            key = SalarySketch.get_key(vacancy.salary)
+            self.get_sketch(self.sketches_by_years, year).add_key(key)
+            if is_profession:
+                self.get_sketch(self.sketches_by_years_for_profession, year).add_key(key)
+            self.get_sketch(self.sketches_by_cities, city).add_key(key)
+
+    @staticmethod
+    def get_sketch(sketches, group):
+        """Возвращает набросок группы, создавая его только при первом обращении
+        Args:
+            sketches (dict): Словарь типа {ключ-группа : значение-набросок зарплат}
+            group: группа (год или город)
         Returns:
-            years_list (wb): лист для таблицы по годам
-            cities_list (wb): лист для таблицы по городам
+            SalarySketch: набросок зарплат группы
         """
-        wb = openpyxl.Workbook()
-        years_list = wb.active
-        years_list.title = "Статистика по годам"
-        cities_list = wb.create_sheet("Статистика по городам")
-        years_list.append(self.years_list_headers)
-        for cell in years_list['1']:
-            cell.font = Font(bold=True)
-        for i in range(len(self.years_list_columns[0])):
-            years_list.append([column[i] for column in self.years_list_columns])
-        cities_list.append(self.cities_list_headers)
-        for cell in cities_list['1']:
-            cell.font = Font(bold=True)
-        for i in range(len(self.cities_list_columns[0])):
-            cities_list.append([column[i] for column in self.cities_list_columns])
-        for cell in cities_list['E']:
-            cell.number_format = FORMAT_PERCENTAGE_00
-        for i in range(1, 6):
-            years_list.column_dimensions[get_column_letter(i)].width = self.years_list_widths[i - 1]
-            cities_list.column_dimensions[get_column_letter(i)].width = self.cities_list_widths[i - 1]
-        self.set_border(years_list, len(self.years_list_headers), len(self.years_list_columns[0]) + 1)
+        sketch = sketches.get(group)
+        if sketch is None:
+            sketch = sketches[group] = SalarySketch()
+        return sketch
+
+    def merge(self, other):
+        """Добавляет к статистике статистику другой части данных
+        Args:
+            other (VacanciesStatistics): статистика другой части данных
+        >>> first, second = VacanciesStatistics("Программист"), VacanciesStatistics("Программист")
+        >>> first.add_vacancy(Vacancy({"name": "Программист", "salary_from": 10000, "salary_to": 100000, "salary_currency": "RUR", "area_name": "Сургут",  "published_at": "2020-07-05T18:19:30+0300"}))
+        >>> second.add_vacancy(Vacancy({"name": "Аналитик", "salary_from": 20000, "salary_to": 40000, "salary_currency": "RUR", "area_name": "Сургут",  "published_at": "2020-07-05T18:19:30+0300"}))
+        >>> first.merge(second)
+        >>> first.rows_count, first.get_salary_by_years(), first.get_vacancies_count_by_years_for_profession()
+        (2, {2020: 42500}, {2020: 1})
+        """
+        self.rows_count += other.rows_count
+        self.quantiles = self.quantiles or other.quantiles
+        for dictionary, other_dictionary in ((self.count_by_years, other.count_by_years),
+                                             (self.salary_sum_by_years, other.salary_sum_by_years),
+                                             (self.count_by_years_for_profession, other.count_by_years_for_profession),
+                                             (self.salary_sum_by_years_for_profession,
+                                              other.salary_sum_by_years_for_profession),
+                                             (self.count_by_cities, other.count_by_cities),
+                                             (self.salary_sum_by_cities, other.salary_sum_by_cities)):
+            for key, value in other_dictionary.items():
+                dictionary[key] = dictionary.get(key, 0) + value
+        for sketches, other_sketches in ((self.sketches_by_years, other.sketches_by_years),
+                                         (self.sketches_by_years_for_profession,
+                                          other.sketches_by_years_for_profession),
+                                         (self.sketches_by_cities, other.sketches_by_cities)):
+            for key, sketch in other_sketches.items():
+                self.get_sketch(sketches, key).merge(sketch)
+
+    def to_dict(self):
+        """Возвращает статистику в виде словаря для сохранения в JSON
+        Returns:
+            dict: словарь со всеми полями статистики
+        """
+        return {"profession": self.profession,
+                "quantiles": self.quantiles,
+                "rows_count": self.rows_count,
+                "count_by_years": list(self.count_by_years.items()),
+                "salary_sum_by_years": list(self.salary_sum_by_years.items()),
+                "count_by_years_for_profession": list(self.count_by_years_for_profession.items()),
+                "salary_sum_by_years_for_profession": list(self.salary_sum_by_years_for_profession.items()),
+                "count_by_cities": list(self.count_by_cities.items()),
+                "salary_sum_by_cities": list(self.salary_sum_by_cities.items()),
+                "sketches_by_years": [(key, list(sketch.counts.items())) for key, sketch
+                                      in self.sketches_by_years.items()],
+                "sketches_by_years_for_profession": [(key, list(sketch.counts.items())) for key, sketch
+                                                     in self.sketches_by_years_for_profession.items()],
+                "sketches_by_cities": [(key, list(sketch.counts.items())) for key, sketch
+                                       in self.sketches_by_cities.items()]}
+
+    @classmethod
+    def from_dict(cls, dictionary):
+        """Восстанавливает статистику из словаря, созданного to_dict
+        Args:
+            dictionary (dict): словарь со всеми полями статистики
+        Returns:
+            VacanciesStatistics: статистика
+        >>> statistics = VacanciesStatistics("Программист", quantiles=True)
+        >>> statistics.add_vacancy(Vacancy({"name": "Программист", "salary_from": 10000, "salary_to": 100000, "salary_currency": "RUR", "area_name": "Сургут",  "published_at": "2020-07-05T18:19:30+0300"}))
+        >>> restored = VacanciesStatistics.from_dict(json.loads(json.dumps(statistics.to_dict())))
+        >>> restored.salary_sum_by_years, restored.quantiles, restored.get_salary_quantiles_by_years() == statistics.get_salary_quantiles_by_years()
+        ({2020: 55000.0}, True, True)
+        """
+        statistics = cls(dictionary["profession"], dictionary.get("quantiles", True))
+        statistics.rows_count = dictionary["rows_count"]
+        for name in ("count_by_years", "salary_sum_by_years", "count_by_years_for_profession",
+                     "salary_sum_by_years_for_profession", "count_by_cities", "salary_sum_by_cities"):
+            setattr(statistics, name, {key: value for key, value in dictionary[name]})
+        for name in ("sketches_by_years", "sketches_by_years_for_profession", "sketches_by_cities"):
+            setattr(statistics, name, {key: SalarySketch(dict(counts)) for key, counts in dictionary[name]})
+        return statistics
+
+    def for_profession(self, profession):
+        """Возвращает копию статистики с общими словарями и пустыми словарями для другой профессии
+        Args:
+            profession (string): профессия
+        Returns:
+            VacanciesStatistics: копия статистики
+        """
+        statistics = copy.copy(self)
+        statistics.profession = profession
+        statistics.count_by_years_for_profession = {}
+        statistics.salary_sum_by_years_for_profession = {}
+        statistics.sketches_by_years_for_profession = {}
+        return statistics
+
+    def get_vacancies_count_by_years(self):
+        """
+        Возвращает словарь годов и кол-ва вакансий
+        Returns:
+            dict: Словарь типа {ключ-год : значение-количество вакансий}
+        """
+        return dict(sorted(self.count_by_years.items(), key=itemgetter(0)))
+
+    def get_vacancies_count_by_years_for_profession(self):
+        """
+        Возвращает словарь годов и кол-ва вакансий определённой профессии
+        Returns:
+            dict: Словарь типа {ключ-год : значение-количество вакансий определённой профессии}
+        """
+        dictionary = dict(sorted(self.count_by_years_for_profession.items(), key=itemgetter(0)))
+        if len(dictionary) == 0:
+            dictionary = {2022: 0}
+        return dictionary
+
+    def get_salary_by_years(self):
+        """
+        Возвращает словарь годов и уровня зарплат
+        Returns:
+            dict: Словарь типа {ключ-год : значение-уровень зарплат}
+        """
+        dictionary = {key: int(value / self.count_by_years[key]) for key, value in self.salary_sum_by_years.items()}
+        return dict(sorted(dictionary.items(), key=itemgetter(0)))
+
+    def get_salary_by_years_for_profession(self):
+        """
+        Возвращает словарь годов и уровня зарплат определённой профессии
+        Returns:
+            dict: Словарь типа {ключ-год : значение-уровень зарплат определённой профессии}
+        """
+        dictionary = {key: int(value / self.count_by_years_for_profession[key])
+                      for key, value in self.salary_sum_by_years_for_profession.items()}
+        dictionary = dict(sorted(dictionary.items(), key=itemgetter(0)))
+        if len(dictionary) == 0:
+            dictionary = {2022: 0}
+        return dictionary
+
+    def get_vacancies_count_by_cities(self):
+        """
+        Возвращает словарь городов и кол-ва вакансий
+        Returns:
+            dict: Словарь типа {ключ-город : значение-кол-во вакансий}
+        """
+        return dict(self.count_by_cities)
+
+    def get_vacancies_share_by_cities(self, min_share=CITY_MIN_SHARE, count=10):
+        """
+        Возвращает словарь городов и процента вакансий от общего кол-ва
+        Args:
+            min_share (float): наименьшая доля вакансий города, при которой он попадает в словарь
+            count (int): сколько городов взять (None - все)
+        Returns:
+            dict: Словарь типа {ключ-город : значение-процент вакансий от общего кол-ва}
+        """
+        dictionary = {}
+        for key in self.count_by_cities:
+            if self.count_by_cities[key] / self.rows_count >= min_share:
+                dictionary[key] = self.count_by_cities[key] / self.rows_count
+        dictionary = dict(sorted(dictionary.items(), key=itemgetter(1), reverse=True))
+        return take_ten_items(dictionary, count)
+
+    def get_salary_by_cities(self, min_share=CITY_MIN_SHARE, count=10):
+        """
+        Возвращает словарь городов и уровня зарплат
+        Args:
+            min_share (float): наименьшая доля вакансий города, при которой он попадает в словарь
+            count (int): сколько городов взять (None - все)
+        Returns:
+            dict: Словарь типа {ключ-город : значение-уровень зарплат}
+        """
+        dictionary = {}
+        for key in self.salary_sum_by_cities:
+            if self.count_by_cities[key] / self.rows_count < min_share:
+                continue
+            dictionary[key] = int(self.salary_sum_by_cities[key] / self.count_by_cities[key])
+        dictionary = dict(sorted(dictionary.items(), key=itemgetter(1), reverse=True))
+        return take_ten_items(dictionary, count)
+
+    def get_salary_quantiles_by_years(self):
+        """
+        Возвращает словарь годов и приближённых квантилей SALARY_QUANTILES зарплат
+        Returns:
+            dict: Словарь типа {ключ-год : значение-список квантилей зарплат}
+        """
+        return get_sketches_quantiles(dict(sorted(self.sketches_by_years.items(), key=itemgetter(0))))
+
+    def get_salary_quantiles_by_years_for_profession(self):
+        """
+        Возвращает словарь годов и приближённых квантилей SALARY_QUANTILES зарплат определённой профессии
+        Returns:
+            dict: Словарь типа {ключ-год : значение-список квантилей зарплат определённой профессии}
+        """
+        return get_sketches_quantiles(dict(sorted(self.sketches_by_years_for_profession.items(), key=itemgetter(0))))
+
+    def get_salary_quantiles_by_cities(self):
+        """
+        Возвращает словарь городов и приближённых квантилей SALARY_QUANTILES зарплат
+        Returns:
+            dict: Словарь типа {ключ-город : значение-список квантилей зарплат}
+        """
+        return get_sketches_quantiles(self.sketches_by_cities)
+
+
+def get_chunk_statistics(rows, profession, rates_file=None, quantiles=False):
+    """Собирает статистику по части вакансий (выполняется в процессе-обработчике)
+    Args:
+        rows (list): кортежи значений полей VACANCY_FIELDS
+        profession (string): профессия
+        rates_file (string): файл курсов валют (разбирается один раз на процесс)
+        quantiles (bool): собирать ли наброски зарплат
+    Returns:
+        VacanciesStatistics: статистика части
+    """
+    rates = get_currency_rates(rates_file) if rates_file is not None else None
+    statistics = VacanciesStatistics(profession, quantiles)
+    for row in rows:
+        statistics.add_vacancy(Vacancy.from_row(row, rates))
+    return statistics
+
+
+def get_record_ranges(file_name, size):
+    """Делит CSV файл после строки заголовков на диапазоны байтов примерно по size, границы которых совпадают
+    с началами записей. Файл читается блоками без разбора CSV: граница переносится на конец строки,
+    до которого от начала диапазона прочитано чётное число кавычек, то есть не внутрь поля в кавычках
+    Args:
+        file_name (string): название файла
+        size (int): примерный размер диапазона в байтах
+    Returns:
+        tuple: заголовки (None для пустого файла) и список пар (начало, конец) диапазонов
+    >>> headlines_list, ranges = get_record_ranges("vacancies.csv", 4096)
+    >>> headlines_list[0], len(ranges) > 1, ranges[-1][1] == os.path.getsize("vacancies.csv")
+    ('name', True, True)
+    >>> all(end == start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+    True
+    """
+    with open(file_name, "rb") as File:
+        header = File.readline()
+        while header.count(b'"') % 2 and header.endswith(b"\n"):
+            header += File.readline()
+        headlines_list = next(csv.reader(io.StringIO(header.decode("utf-8-sig"), newline="")), None)
+        file_size = os.path.getsize(file_name)
+        ranges = []
+        start = File.tell()
+        while start < file_size:
+            quotes = File.read(size).count(b'"')
+            line = File.readline()
+            quotes += line.count(b'"')
+            while quotes % 2 and line:
+                line = File.readline()
+                quotes += line.count(b'"')
+            end = min(File.tell(), file_size)
+            ranges.append((start, end))
+            start = end
+    return headlines_list, ranges
+
+
+def get_range_statistics(file_name, start, end, headlines_list, profession, validation="all", rates_file=None,
+                         quantiles=False):
+    """Собирает статистику по диапазону байтов CSV файла из get_record_ranges (выполняется в процессе-обработчике)
+    Args:
+        file_name (string): название файла
+        start (int): начало диапазона
+        end (int): конец диапазона
+        headlines_list (list): заголовки файла
+        profession (string): профессия
+        validation (string): какие поля строки должны быть непустыми
+        rates_file (string): файл курсов валют (разбирается один раз на процесс)
+        quantiles (bool): собирать ли наброски зарплат
+    Returns:
+        VacanciesStatistics: статистика диапазона
+    >>> headlines_list, ranges = get_record_ranges("vacancies.csv", 4096)
+    >>> statistics = VacanciesStatistics("Программист")
+    >>> for start, end in ranges:
+    ...     statistics.merge(get_range_statistics("vacancies.csv", start, end, headlines_list, "Программист"))
+    >>> statistics.get_salary_by_cities() == DataSet("vacancies.csv", "Программист", "streaming").salary_by_cities
+    True
+    """
+    rates = get_currency_rates(rates_file) if rates_file is not None else None
+    with open(file_name, "rb") as File:
+        File.seek(start)
+        reader = csv.reader(io.StringIO(File.read(end - start).decode("utf-8"), newline=""))
+    statistics = VacanciesStatistics(profession, quantiles)
+    for row in project_rows(reader, headlines_list, validation):
+        statistics.add_vacancy(Vacancy.from_row(row, rates))
+    return statistics
+
+
+def get_shard_statistics(file_name, profession, validation="all", rates_file=None, quantiles=False):
+    """Собирает статистику по одному файлу из папки (выполняется в процессе-обработчике)
+    Args:
+        file_name (string): название файла
+        profession (string): профессия
+        validation (string): какие поля строки должны быть непустыми
+        rates_file (string): файл курсов валют
+        quantiles (bool): собирать ли наброски зарплат
+    Returns:
+        VacanciesStatistics: статистика файла
+    """
+    return DataSet(file_name, profession, "streaming", validation=validation, rates_file=rates_file,
+                   quantiles=quantiles).statistics
+
+
+def get_input_format(file_name):
+    """Определяет формат входного файла по расширению
+    Args:
+        file_name (string): название файла
+    Returns:
+        string: "csv" или значение из INPUT_FORMATS
+    >>> get_input_format("vacancies.csv"), get_input_format("vacancies.npz"), get_input_format("vacancies.columns/")
+    ('csv', 'npz', 'npy')
+    """
+    return INPUT_FORMATS.get(os.path.splitext(file_name.rstrip("/" + os.sep))[1].lower(), "csv")
+
+
+def load_input_columns(file_name, input_format):
+    """Читает из файла только столбцы INPUT_COLUMNS. Из .npz читаются только нужные члены архива,
+    папка .columns отображается в память (mmap) без копирования, а из Parquet и Feather (нужен pyarrow)
+    читаются только поля VACANCY_FIELDS
+    Args:
+        file_name (string): название файла
+        input_format (string): формат из INPUT_FORMATS
+    Returns:
+        dict: Словарь типа {ключ-столбец из INPUT_COLUMNS : значение-массив}
+    """
+    if input_format == "npz":
+        with np.load(file_name) as data:
+            columns = {column: data[column] for column in INPUT_COLUMNS}
+    elif input_format == "npy":
+        columns = {column: np.load(os.path.join(file_name, f"{column}.npy"), mmap_mode="r") for column in INPUT_COLUMNS}
+    else:
+        import pyarrow.feather
+        import pyarrow.parquet
+        read_table = pyarrow.parquet.read_table if input_format == "parquet" else pyarrow.feather.read_table
+        columns = get_arrow_columns(read_table(file_name, columns=list(VACANCY_FIELDS)))
+    if not len(columns["salary_from"]):
+        print("Нет данных")
+        exit()
+    return columns
+
+
+def get_arrow_columns(table):
+    """Переводит таблицу pyarrow с полями VACANCY_FIELDS в столбцы INPUT_COLUMNS
+    Args:
+        table (pyarrow.Table): таблица
+    Returns:
+        dict: Словарь типа {ключ-столбец из INPUT_COLUMNS : значение-массив}
+    """
+    columns = {}
+    for field, codes, values in (("name", "name_codes", "names"), ("salary_currency", "currency_codes", "currencies"),
+                                 ("area_name", "city_codes", "cities")):
+        encoded = table.column(field).combine_chunks().dictionary_encode()
+        columns[codes] = encoded.indices.to_numpy(zero_copy_only=False).astype(np.intp)
+        columns[values] = np.array(encoded.dictionary.to_pylist(), dtype=str)
+    columns["salary_from"] = table.column("salary_from").to_numpy().astype(np.float64)
+    columns["salary_to"] = table.column("salary_to").to_numpy().astype(np.float64)
+    columns["published_at"] = get_published_dates(table.column("published_at").to_pylist())
+    return columns
+
+
+def get_published_dates(published):
+    """Переводит даты публикации вида "2022-07-17T18:23:06+0300" в массив datetime64 без часового пояса
+    Args:
+        published (list): даты публикации
+    Returns:
+        np.ndarray: даты публикации с точностью до секунды
+    >>> get_published_dates(["2022-07-17T18:23:06+0300"])
+    array(['2022-07-17T18:23:06'], dtype='datetime64[s]')
+    """
+    return np.array([date[:19] for date in published], dtype="datetime64[s]")
+
+
+def iter_input_rows(columns):
+    """Отдаёт вакансии из столбцов INPUT_COLUMNS кортежами значений полей VACANCY_FIELDS
+    (для режимов, обрабатывающих вакансии по одной), переводя даты в строки частями
+    Args:
+        columns (dict): Словарь типа {ключ-столбец из INPUT_COLUMNS : значение-массив}
+    Yields:
+        tuple: значения полей VACANCY_FIELDS
+    """
+    names, currencies, cities = columns["names"].tolist(), columns["currencies"].tolist(), columns["cities"].tolist()
+    for start in range(0, len(columns["salary_from"]), PARALLEL_CHUNK_SIZE):
+        end = start + PARALLEL_CHUNK_SIZE
+        yield from zip(map(names.__getitem__, columns["name_codes"][start:end].tolist()),
+                       columns["salary_from"][start:end].tolist(), columns["salary_to"][start:end].tolist(),
+                       map(currencies.__getitem__, columns["currency_codes"][start:end].tolist()),
+                       map(cities.__getitem__, columns["city_codes"][start:end].tolist()),
+                       np.datetime_as_string(columns["published_at"][start:end], unit="s").tolist())
+
+
+def convert_file(file_name, target_name, validation="all"):
+    """Переводит CSV файл вакансий в столбцы: .npz, папку .columns из файлов .npy (можно отображать в память),
+    а при установленном pyarrow - .parquet или .feather. Некорректные строки отбрасываются при переводе.
+    Строки разбираются частями по PARALLEL_CHUNK_SIZE: каждая часть сразу переводится в массивы numpy
+    (или записывается отдельной группой строк в файл pyarrow), поэтому весь файл не хранится списком строк
+    Args:
+        file_name (string): название CSV файла
+        target_name (string): название файла столбцов, формат определяется по расширению
+        validation (string): какие поля строки должны быть непустыми, один из VALIDATION_MODES
+    Returns:
+        int: количество вакансий
+    >>> import tempfile
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     rows_count = convert_file("vacancies.csv", os.path.join(directory, "vacancies.columns"))
+    ...     dataset = DataSet(os.path.join(directory, "vacancies.columns"), "Программист", "columnar")
+    >>> rows_count == dataset.get_rows_count(), dataset.salary_by_cities == DataSet("vacancies.csv", "Программист").salary_by_cities
+    (True, True)
+    """
+    input_format = get_input_format(target_name)
+    if input_format == "csv":
+        raise ValueError(f"Неизвестный формат файла столбцов: {target_name}")
+    rows_count = 0
+    with open(file_name, encoding="utf-8-sig") as File:
+        reader = csv.reader(File)
+        headlines_list = next(reader)
+        rows = project_rows(reader, headlines_list, validation)
+        chunks = iter(lambda: list(islice(rows, PARALLEL_CHUNK_SIZE)), [])
+        if input_format in ("parquet", "feather"):
+            import pyarrow
+            import pyarrow.ipc
+            import pyarrow.parquet
+            types = {"salary_from": pyarrow.float64(), "salary_to": pyarrow.float64()}
+            schema = pyarrow.schema([(field, types.get(field, pyarrow.string())) for field in VACANCY_FIELDS])
+            writer = pyarrow.parquet.ParquetWriter(target_name, schema) if input_format == "parquet" \
+                else pyarrow.ipc.new_file(target_name, schema)
+            with writer:
+                for chunk in chunks:
+                    rows_count += len(chunk)
+                    writer.write_table(pyarrow.table({field: [float(value) for value in values] if field in types
+                                                      else list(values)
+                                                      for field, values in zip(VACANCY_FIELDS, zip(*chunk))},
+                                                     schema=schema))
+            return rows_count
+        values = {"name": {}, "currency": {}, "city": {}}
+        parts = {"name_codes": [np.zeros(0, dtype=np.int32)], "currency_codes": [np.zeros(0, dtype=np.int32)],
+                 "city_codes": [np.zeros(0, dtype=np.int32)], "salary_from": [np.zeros(0, dtype=np.float64)],
+                 "salary_to": [np.zeros(0, dtype=np.float64)], "published_at": [get_published_dates([])]}
+        for chunk in chunks:
+            rows_count += len(chunk)
+            for index, column in ((0, "name"), (3, "currency"), (4, "city")):
+                column_values = values[column]
+                parts[f"{column}_codes"].append(np.array([column_values.setdefault(row[index], len(column_values))
+                                                          for row in chunk], dtype=np.int32))
+            parts["salary_from"].append(np.array([row[1] for row in chunk], dtype=np.float64))
+            parts["salary_to"].append(np.array([row[2] for row in chunk], dtype=np.float64))
+            parts["published_at"].append(get_published_dates([row[5] for row in chunk]))
+    arrays = {column: np.concatenate(part) for column, part in parts.items()}
+    arrays["names"] = np.array(list(values["name"]), dtype=str)
+    arrays["currencies"] = np.array(list(values["currency"]), dtype=str)
+    arrays["cities"] = np.array(list(values["city"]), dtype=str)
+    if input_format == "npz":
+        with open(target_name, "wb") as File:
+            np.savez(File, **arrays)
+    else:
+        os.makedirs(target_name, exist_ok=True)
+        for column, array in arrays.items():
+            np.save(os.path.join(target_name, f"{column}.npy"), array)
+    return rows_count
+
+
+class VacanciesColumns:
+    """Хранит вакансии по столбцам в типизированных массивах numpy
+
+    Attributes:
+        name_codes (np.ndarray): номера названий вакансий в массиве names
+        names (np.ndarray): различные названия вакансий в порядке первого появления
+        salaries (np.ndarray): средние зарплаты в рублях
+        years (np.ndarray): годы публикации
+        year_values (list): различные годы по возрастанию
+        year_codes (np.ndarray): номера годов вакансий в списке year_values
+        city_codes (np.ndarray): номера городов в списке cities
+        cities (list): города в порядке первого появления
+        name_index (NameIndex): индекс по массиву names
+        salary_keys (np.ndarray): номера корзин SalarySketch для зарплат или None, пока квантили не запрошены
+    """
+
+    def __init__(self, name_codes, names, salaries, years, city_codes, cities):
+        """Инициализируект объект VacanciesColumns
+        Args:
+            name_codes (np.ndarray): номера названий вакансий в массиве names
+            names (np.ndarray): различные названия вакансий
+            salaries (np.ndarray): средние зарплаты в рублях
+            years (np.ndarray): годы публикации
+            city_codes (np.ndarray): номера городов в списке cities
+            cities (list): города в порядке первого появления
+        """
+        self.name_codes = name_codes
+        self.names = names
+        self.salaries = salaries
+        self.years = years
+        year_values, self.year_codes = np.unique(years, return_inverse=True)
+        self.year_values = year_values.tolist()
+        self.city_codes = city_codes
+        self.cities = cities
+        self.name_index = NameIndex(names.tolist())
+        self.salary_keys = None
+
+    @classmethod
+    def from_rows(cls, rows, rates=None):
+        """Раскладывает вакансии по столбцам
+        Args:
+            rows (iterable): кортежи значений полей VACANCY_FIELDS
+            rates (CurrencyRates): курсы валют по датам (по умолчанию - currency_to_rub)
+        Returns:
+            VacanciesColumns: вакансии по столбцам
+        >>> columns = VacanciesColumns.from_rows([("Программист", "10000", "100000", "EUR", "Сургут", "2020-07-05T18:19:30+0300")])
+        >>> columns.salaries.tolist(), columns.years.tolist(), columns.cities
+        ([3294500.0], [2020], ['Сургут'])
+        """
+        name_codes = []
+        salaries_from = []
+        salaries_to = []
+        currency_codes = []
+        city_codes = []
+        published = []
+        names = {}
+        currencies = {}
+        cities = {}
+        for name, salary_from, salary_to, salary_currency, area_name, published_at in rows:
+            name_codes.append(names.setdefault(name, len(names)))
+            salaries_from.append(salary_from)
+            salaries_to.append(salary_to)
+            currency_codes.append(currencies.setdefault(salary_currency, len(currencies)))
+            city_codes.append(cities.setdefault(area_name, len(cities)))
+            published.append(published_at)
+        currency_codes = np.array(currency_codes, dtype=np.intp)
+        if rates is None:
+            rates = np.array([currency_to_rub[currency] for currency in currencies], dtype=np.float64)[currency_codes]
+        else:
+            rates = rates.get_rates(currency_codes, list(currencies), np.array(published, dtype="U10"))
+        salaries = (np.array(salaries_from, dtype=np.float64) + np.array(salaries_to, dtype=np.float64)) / 2 * rates
+        return cls(np.array(name_codes, dtype=np.intp), np.array(list(names), dtype=str), salaries,
+                   np.array(published, dtype="U4").astype(np.int64), np.array(city_codes, dtype=np.intp),
+                   list(cities))
+
+    @classmethod
+    def from_input(cls, columns, rates=None):
+        """Собирает вакансии по столбцам из столбцов входного файла векторными операциями, без разбора текста
+        Args:
+            columns (dict): Словарь типа {ключ-столбец из INPUT_COLUMNS : значение-массив}
+            rates (CurrencyRates): курсы валют по датам (по умолчанию - currency_to_rub)
+        Returns:
+            VacanciesColumns: вакансии по столбцам
+        """
+        currency_codes = np.asarray(columns["currency_codes"], dtype=np.intp)
+        currencies = columns["currencies"].tolist()
+        published = columns["published_at"]
+        if rates is None:
+            rates = np.array([currency_to_rub[currency] for currency in currencies], dtype=np.float64)[currency_codes]
+        else:
+            rates = rates.get_rates(currency_codes, currencies, published.astype("datetime64[D]").astype("U10"))
+        salaries = (columns["salary_from"] + columns["salary_to"]) / 2 * rates
+        years = published.astype("datetime64[Y]").astype(np.int64) + 1970
+        return cls(np.asarray(columns["name_codes"], dtype=np.intp), np.asarray(columns["names"]), salaries, years,
+                   np.asarray(columns["city_codes"], dtype=np.intp), columns["cities"].tolist())
+
+    @classmethod
+    def load(cls, cache_name, file_name, rates_hash=""):
+        """Загружает столбцы из кэша, если он построен по неизменённому файлу с теми же курсами валют.
+        Совпавшему отпечатку (путь, размер, время изменения) кэш доверяет без чтения исходного файла; если отпечаток
+        изменился, сравнивается хэш содержимого, и при совпадении (например, после touch) в кэше обновляется
+        только отпечаток
+        Args:
+            cache_name (string): название файла кэша
+            file_name (string): название исходного файла
+            rates_hash (string): хэш файла курсов ("" - курсы из currency_to_rub)
+        Returns:
+            VacanciesColumns: вакансии по столбцам или None, если кэша нет или он устарел
+        """
+        if not os.path.exists(cache_name):
+            return None
+        fingerprint = get_file_fingerprint(file_name)
+        with np.load(cache_name) as data:
+            cached_rates_hash = str(data["rates_hash"]) if "rates_hash" in data.files else ""
+            if cached_rates_hash != rates_hash:
+                return None
+            content_hash = str(data["content_hash"])
+            refresh = str(data["fingerprint"]) != fingerprint
+            if refresh and content_hash != get_file_hash(file_name):
+                return None
+            columns = cls(data["name_codes"], data["names"], data["salaries"], data["years"], data["city_codes"],
+                          data["cities"].tolist())
+        if refresh:
+            columns.save(cache_name, fingerprint, content_hash, rates_hash)
+        return columns
+
+    def save(self, cache_name, fingerprint, content_hash, rates_hash=""):
+        """Сохраняет столбцы в кэш рядом с исходным файлом. Если записать кэш не удалось (например, папка
+        исходного файла только для чтения), выводит предупреждение в stderr и продолжает работу без кэша
+        Args:
+            cache_name (string): название файла кэша
+            fingerprint (string): путь, размер и время изменения исходного файла
+            content_hash (string): хэш содержимого исходного файла
+            rates_hash (string): хэш файла курсов, по которым переведены зарплаты
+        Returns:
+            bool: сохранён ли кэш
+        >>> import contextlib
+        >>> with contextlib.redirect_stderr(io.StringIO()) as errors:
+        ...     saved = DataSet("vacancies.csv", "Программист", "columnar").columns.save(os.path.join("missing", "cache.npz"), "", "")
+        >>> saved, errors.getvalue().startswith("Не удалось сохранить кэш")
+        (False, True)
+        """
+        temporary_name = f"{cache_name}.{os.getpid()}.tmp"
+        try:
+            with open(temporary_name, "wb") as File:
+                np.savez(File, fingerprint=fingerprint, content_hash=content_hash, rates_hash=rates_hash,
+                         name_codes=self.name_codes, names=self.names, salaries=self.salaries, years=self.years,
+                         city_codes=self.city_codes, cities=np.array(self.cities, dtype=str))
+            os.replace(temporary_name, cache_name)
+        except OSError as exception:
+            print(f"Не удалось сохранить кэш {cache_name}: {exception}", file=sys.stderr)
+            if os.path.exists(temporary_name):
+                os.remove(temporary_name)
+            return False
+        return True
+
+    def get_statistics(self, profession, quantiles=False):
+        """Считает суммы и количества вакансий векторными операциями
+        Args:
+            profession (string): профессия
+            quantiles (bool): строить ли наброски зарплат
+        Returns:
+            VacanciesStatistics: статистика, совпадающая с построчным подсчётом
+        """
+        statistics = VacanciesStatistics(profession, quantiles)
+        statistics.rows_count = len(self.salaries)
+        counts = np.bincount(self.year_codes, minlength=len(self.year_values))
+        sums = np.bincount(self.year_codes, weights=self.salaries, minlength=len(self.year_values))
+        statistics.count_by_years = dict(zip(self.year_values, counts.tolist()))
+        statistics.salary_sum_by_years = dict(zip(self.year_values, sums.tolist()))
+        self.count_profession(statistics)
+        counts = np.bincount(self.city_codes, minlength=len(self.cities))
+        sums = np.bincount(self.city_codes, weights=self.salaries, minlength=len(self.cities))
+        statistics.count_by_cities = dict(zip(self.cities, counts.tolist()))
+        statistics.salary_sum_by_cities = dict(zip(self.cities, sums.tolist()))
+        if quantiles:
+            statistics.sketches_by_years = self.get_sketches(self.year_codes, self.get_salary_keys(), self.year_values)
+            statistics.sketches_by_cities = self.get_sketches(self.city_codes, self.get_salary_keys(), self.cities)
+        return statistics
+
+    def get_salary_keys(self):
+        """Возвращает номера корзин SalarySketch для зарплат, считая их при первом запросе квантилей
+        Returns:
+            np.ndarray: номера корзин зарплат
+        """
+        if self.salary_keys is None:
+            self.salary_keys = SalarySketch.get_keys(self.salaries)
+        return self.salary_keys
+
+    def get_sketches(self, group_codes, salary_keys, group_values):
+        """Строит наброски зарплат для групп вакансий одним вызовом np.unique по парам (группа, корзина)
+        Args:
+            group_codes (np.ndarray): номера групп вакансий
+            salary_keys (np.ndarray): номера корзин зарплат вакансий
+            group_values (list): группы (годы или города)
+        Returns:
+            dict: Словарь типа {ключ-группа : значение-набросок зарплат}
+        """
+        sketches = {}
+        if not len(salary_keys):
+            return sketches
+        low = int(salary_keys.min())
+        span = int(salary_keys.max()) - low + 1
+        codes, counts = np.unique(group_codes.astype(np.int64) * span + (salary_keys - low), return_counts=True)
+        groups, keys = np.divmod(codes, span)
+        for group, key, count in zip(groups.tolist(), (keys + low).tolist(), counts.tolist()):
+            sketches.setdefault(group_values[group], SalarySketch()).counts[key] = count
+        return sketches
+
+    def count_profession(self, statistics):
+        """Заполняет словари статистики по годам для профессии statistics.profession
+        Args:
+            statistics (VacanciesStatistics): статистика с пустыми словарями профессии
+        """
+        is_name = np.zeros(len(self.names), dtype=bool)
+        is_name[self.name_index.find(statistics.profession)] = True
+        is_profession = is_name[self.name_codes]
+        year_codes = self.year_codes[is_profession]
+        counts = np.bincount(year_codes, minlength=len(self.year_values))
+        sums = np.bincount(year_codes, weights=self.salaries[is_profession], minlength=len(self.year_values))
+        for year, count, salary_sum in zip(self.year_values, counts.tolist(), sums.tolist()):
+            if count > 0:
+                statistics.count_by_years_for_profession[year] = count
+                statistics.salary_sum_by_years_for_profession[year] = salary_sum
+        if statistics.quantiles:
+            salary_keys = self.get_salary_keys()[is_profession]
+            statistics.sketches_by_years_for_profession = self.get_sketches(year_codes, salary_keys, self.year_values)
+
+
+class NameIndex:
+    """Индекс n-грамм по названиям вакансий для поиска вакансий, в названии которых есть подстрока.
+    Одинаковые названия хранятся один раз, кандидаты из индекса проверяются оператором in,
+    поэтому результат совпадает с проверкой "profession in name" по каждой вакансии
+
+    Attributes:
+        n (int): длина n-граммы
+        names (list): различные названия в порядке первого появления
+        rows (list): для каждого названия - номера вакансий с этим названием
+        ngrams (dict): Словарь типа {ключ-n-грамма : значение-множество номеров названий}
+    """
+
+    def __init__(self, names, n=NAME_INDEX_NGRAM):
+        """Инициализируект объект NameIndex
+        Args:
+            names (iterable): названия вакансий
+            n (int): длина n-граммы
+        """
+        self.n = n
+        self.names = []
+        self.rows = []
+        self.ngrams = {}
+        name_ids = {}
+        for row, name in enumerate(names):
+            name_id = name_ids.get(name)
+            if name_id is None:
+                name_id = name_ids[name] = len(self.names)
+                self.names.append(name)
+                self.rows.append([])
+                for i in range(len(name) - n + 1):
+                    self.ngrams.setdefault(name[i:i + n], set()).add(name_id)
+            self.rows[name_id].append(row)
+
+    def find_names(self, query):
+        """Ищет названия, содержащие подстроку
+        Args:
+            query (string): подстрока
+        Returns:
+            list: отсортированный список номеров названий
+        >>> NameIndex(["Программист", "Аналитик", "Старший программист", "Программист"]).find_names("рограммист")
+        [0, 2]
+        """
+        if len(query) < self.n:
+            candidates = range(len(self.names))
+        else:
+            postings = sorted((self.ngrams.get(query[i:i + self.n], set()) for i in range(len(query) - self.n + 1)),
+                              key=len)
+            candidates = sorted(set.intersection(*postings))
+        return [name_id for name_id in candidates if query in self.names[name_id]]
+
+    def find(self, query):
+        """Ищет вакансии, в названии которых есть подстрока
+        Args:
+            query (string): подстрока
+        Returns:
+            list: отсортированный список номеров вакансий
+        >>> NameIndex(["Программист", "Аналитик", "Старший программист", "Программист"]).find("рограммист")
+        [0, 2, 3]
+        >>> NameIndex(["Программист", "Аналитик"]).find("")
+        [0, 1]
+        """
+        return sorted(row for name_id in self.find_names(query) for row in self.rows[name_id])
+
+
+class Report:
+    """Класс для визуализации статистики
+
+    Attributes:
+        profession (string): профессия
+        excel_file (string): путь к Excel файлу
+        image_file (string): путь к изображению с диаграммами
+        pdf_file (string): путь к pdf документу
+        years_list_headers (list): список заголовков, связынных с годами
+        years_list_columns (list): список годов и параметров, связанных с ними
+        cities_list_headers (list): список заголовков, связынных с городами
+        cities_list_columns (list): список городов и параметров, связанных с ними
+        years_list_widths (list): список ширин для таблицы по годам
+        cities_list_widths (list): список ширин для таблицы по городам
+        full_cities_list_columns (list): столбцы таблицы по всем городам или None
+        full_cities_list_widths (list): список ширин для таблицы по всем городам или None
+        quantile_tables (list): таблицы квантилей зарплат в виде списков (название, заголовки, столбцы, ширины)
+    """
+
+    def __init__(self, dataset, output_directory=".", full_cities=False, quantiles=False):
+        """Инициализируект объект Report, формирует различные данные
+        Args:
+            dat1aset (DataSet): dataset
+            output_directory (string): папка для report.xlsx, graph.png и report.pdf
+            full_cities (bool): подготовить ли для export_excel таблицу по всем городам
+            quantiles (bool): добавить ли в Excel и pdf таблицы квантилей SALARY_QUANTILES зарплат
+        >>> import tempfile
+        >>> with tempfile.TemporaryDirectory() as directory:
+        ...     file_name = os.path.join(directory, "vacancies.csv")
+        ...     with open(file_name, "w", encoding="utf-8-sig", newline="") as File:
+        ...         csv.writer(File).writerows([VACANCY_FIELDS,
+        ...                                     ("Аналитик", 10000, 20000, "RUR", "Москва", "2020-07-05T18:19:30+0300"),
+        ...                                     ("Программист", 30000, 50000, "RUR", "Москва", "2021-07-05T18:19:30+0300"),
+        ...                                     ("Аналитик", 20000, 40000, "RUR", "Москва", "2022-07-05T18:19:30+0300")])
+        ...     report = Report(DataSet(file_name, "Программист", "columnar"), directory)
+        >>> report.years_list_columns
+        [[2020, 2021, 2022], [15000, 40000, 30000], [0, 40000, 0], [1, 1, 1], [0, 1, 0]]
+        """
+        self.profession = dataset.profession
+        self.set_output_directory(output_directory)
+        self.years_list_headers = (
+            "Год", "Средняя зарплата", f"Средняя зарплата - {self.profession}", "Количество вакансий",
+            f"Количество вакансий - {self.profession}")
+        years = list(dataset.salary_by_years)
+        self.years_list_columns = [years,
+                                   [dataset.salary_by_years[year] for year in years],
+                                   [dataset.salary_by_years_for_profession.get(year, 0) for year in years],
+                                   [dataset.vacancies_count_by_years.get(year, 0) for year in years],
+                                   [dataset.vacancies_count_by_years_for_profession.get(year, 0) for year in years]]
+
+        self.cities_list_headers = ("Город", "Уровень зарплат", "", "Город", "Доля вакансий")
+        self.cities_list_columns = self.get_cities_list_columns(dataset.salary_by_cities,
+                                                                dataset.vacancies_share_by_cities)
+
+        self.years_list_widths = self.get_widths(self.years_list_headers, self.years_list_columns)
+        self.cities_list_widths = self.get_widths(self.cities_list_headers, self.cities_list_columns)
+
+        self.full_cities_list_columns = None
+        self.full_cities_list_widths = None
+        if full_cities:
+            self.full_cities_list_columns = self.get_cities_list_columns(*dataset.get_full_city_tables())
+            self.full_cities_list_widths = self.get_widths(self.cities_list_headers, self.full_cities_list_columns)
+
+        self.quantile_tables = []
+        if quantiles:
+            by_years, by_years_for_profession, by_cities = dataset.get_salary_quantiles()
+            names = [get_quantile_name(quantile) for quantile in SALARY_QUANTILES]
+            missing = [""] * len(SALARY_QUANTILES)
+            self.add_quantile_table("Квантили зарплат по годам",
+                                    ("Год", *names, *(f"{name} - {self.profession}" for name in names)),
+                                    [[year, *by_years[year], *by_years_for_profession.get(year, missing)]
+                                     for year in by_years])
+            cities = (self.full_cities_list_columns or self.cities_list_columns)[0]
+            self.add_quantile_table("Квантили зарплат по городам", ("Город", *names),
+                                    [[city, *by_cities[city]] for city in cities])
+
+    def add_quantile_table(self, title, headers, rows):
+        """Добавляет таблицу квантилей зарплат в quantile_tables
+        Args:
+            title (string): название таблицы
+            headers (tuple): заголовки
+            rows (list): строки таблицы
+        """
+        columns = [list(column) for column in zip(*rows)] or [[] for header in headers]
+        self.quantile_tables.append((title, headers, columns, self.get_widths(headers, columns)))
+
+    def set_output_directory(self, output_directory):
+        """Задаёт папку для report.xlsx, graph.png и report.pdf
+        Args:
+            output_directory (string): папка для файлов отчёта
+        """
+        self.excel_file = os.path.join(output_directory, REPORT_FILES["excel"][0])
+        self.image_file = os.path.join(output_directory, REPORT_FILES["image"][0])
+        self.pdf_file = os.path.join(output_directory, REPORT_FILES["pdf"][0])
+
+    def get_cities_list_columns(self, salary_by_cities, share_by_cities):
+        """Формирует столбцы таблицы по городам
+        Args:
+            salary_by_cities (dict): Словарь типа {ключ-город : значение-уровень зарплат}
+            share_by_cities (dict): Словарь типа {ключ-город : значение-процент вакансий от общего кол-ва}
+        Returns:
+            list: список городов и параметров, связанных с ними
+        """
+        return [[city for city in salary_by_cities],
+                [value for value in salary_by_cities.values()],
+                ["" for i in range(len(salary_by_cities))],
+                [city for city in share_by_cities],
+                [value for value in share_by_cities.values()]]
+
+    def get_widths(self, headers, columns):
+        """Считает ширины столбцов таблицы по самому длинному значению
+        Args:
+            headers (tuple): заголовки
+            columns (list): столбцы
+        Returns:
+            list: список ширин
+        """
+        widths = [len(header) + 2 for header in headers]
+        for i in range(len(columns)):
+            for cell in columns[i]:
+                widths[i] = max(len(str(cell)) + 2, widths[i])
+        return widths
+
+    def set_border(self, ws, width, height):
+        """Устанавливает рамки для таблицы
+        Args:
+            ws (openpyxl.Workbook()): Excel лист
+            width (float): ширина
+            height (float) высота
+        """
+        from openpyxl.styles import Border, Side
+        from openpyxl.utils import get_column_letter
+        cell_range = f'A1:{get_column_letter(width)}{height}'
+        thin = Side(border_style="thin", color="000000")
+        for row in ws[cell_range]:
+            for cell in row:
+                cell.border = Border(top=thin, left=thin, right=thin, bottom=thin)
+
+    def clear_column(self, ws, column):
+        """Удаляет рамки для столбца таблицы
+        Args:
+            ws (openpyxl.Workbook()): Excel лист
+            column (string): буква, соответствующая столбцу
+        """
+        from openpyxl.styles import Border, Side
+        empty = Side(border_style=None)
+        for cell in ws[column]:
+            cell.border = Border(top=empty, bottom=empty)
+
+    def get_vertical_chart(self, title, parameter_1, parameter_1_name, parameter_2,
+                           parameter_2_name, labels, fig, number):
+        """Создаёт вертикальную диаграмму
+        Args:
+            title (string): Название
+            parameter_1 (list): первый параметр
+            parameter_1_name (string): название первого параметра
+            parameter_2 (list): второй параметр
+            parameter_2_name (string): название втрого параметра
+            labels (list): лейблы
+            fig (Figure): фигура
+            number (int): расположение графика на листе
+        """
+        x = np.arange(len(labels))
+        width = 0.35
+        ax = fig.add_subplot(number)
+        ax.bar(x - width / 2, parameter_1, width, label=parameter_1_name)
+        ax.bar(x + width / 2, parameter_2, width, label=parameter_2_name)
+        ax.set_xticks(x, labels, rotation="vertical")
+        ax.tick_params(labelsize=CHART_FONT_SIZE)
+        ax.yaxis.get_offset_text().set_fontsize(CHART_FONT_SIZE)
+        ax.grid(axis='y')
+        ax.set_title(title, fontsize=CHART_FONT_SIZE * 1.2)
+        ax.legend(fontsize=CHART_FONT_SIZE)
+
+    def get_horizontal_chart(self, title, parameter, labels, fig):
+        """Создаёт горизонтальную диаграмму
+        Args:
+            title (string): Название
+            parameter (list): параметр
+            labels (list): лейблы
+            fig (Figure): фигура
+        """
+        ax = fig.add_subplot(223)
+        labels = [city.replace(' ', '\n').replace('-', '-\n') for city in labels]
+        y = np.arange(len(labels))
+        ax.barh(y, parameter)
+        ax.set_yticks(y, labels=labels)
+        ax.tick_params(axis='x', labelsize=CHART_FONT_SIZE)
+        ax.tick_params(axis='y', labelsize=CHART_SMALL_FONT_SIZE)
+        ax.xaxis.get_offset_text().set_fontsize(CHART_FONT_SIZE)
+        ax.grid(axis='x')
+        ax.invert_yaxis()
+        ax.set_title(title, fontsize=CHART_FONT_SIZE * 1.2)
+
+    def get_pie_chart(self, title, parameter, labels, fig):
+        """Создаёт круговую диаграмму с долей остальных городов; переданные списки не изменяются
+        Args:
+            title (string): Название
+            parameter (list): параметр
+            labels (list): лейблы
+            fig (Figure): фигура
+        """
+        ax = fig.add_subplot(224)
+        ax.pie([1 - sum(parameter)] + list(parameter), labels=["Другие"] + list(labels),
+               textprops={'fontsize': CHART_SMALL_FONT_SIZE})
+        ax.axis('equal')
+        ax.set_title(title, fontsize=CHART_SMALL_FONT_SIZE * 1.2)
+
+    @profiler.stage("Report.generate_excel")
+    def generate_excel(self):
+        """Создаёт вертикальную диаграмму
+        Returns:
+            years_list (wb): лист для таблицы по годам
+            cities_list (wb): лист для таблицы по городам
+        """
+        import openpyxl
+        from openpyxl.styles import Font
+        from openpyxl.styles.numbers import FORMAT_PERCENTAGE_00
+        from openpyxl.utils import get_column_letter
+        wb = openpyxl.Workbook()
+        years_list = wb.active
+        years_list.title = "Статистика по годам"
+        cities_list = wb.create_sheet("Статистика по городам")
+        years_list.append(self.years_list_headers)
+        for cell in years_list['1']:
+            cell.font = Font(bold=True)
+        for i in range(len(self.years_list_columns[0])):
+            years_list.append([column[i] for column in self.years_list_columns])
+        cities_list.append(self.cities_list_headers)
+        for cell in cities_list['1']:
+            cell.font = Font(bold=True)
+        for i in range(len(self.cities_list_columns[0])):
+            cities_list.append([column[i] for column in self.cities_list_columns])
+        for cell in cities_list['E']:
+            cell.number_format = FORMAT_PERCENTAGE_00
+        for i in range(1, 6):
+            years_list.column_dimensions[get_column_letter(i)].width = self.years_list_widths[i - 1]
+            cities_list.column_dimensions[get_column_letter(i)].width = self.cities_list_widths[i - 1]
+        self.set_border(years_list, len(self.years_list_headers), len(self.years_list_columns[0]) + 1)
         self.set_border(cities_list, len(self.cities_list_headers), len(self.cities_list_columns[0]) + 1)
         self.clear_column(cities_list, 'C')
-        wb.save('report.xlsx')
+        wb.save(self.excel_file)
         return years_list, cities_list
 
+    @profiler.stage("Report.export_excel")
+    def export_excel(self, file_name=None):
+        """Сохраняет таблицы в Excel в режиме write_only: строки сразу пишутся в файл, а рамки и формат
+        задаются общими именованными стилями, а не отдельным объектом Border для каждой ячейки.
+        Если отчёт создан с full_cities=True, таблица по городам выводится по всем городам
+        Args:
+            file_name (string): путь к Excel файлу (по умолчанию - excel_file)
+        """
+        import openpyxl
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Border, Font, NamedStyle, Side
+        from openpyxl.styles.numbers import FORMAT_PERCENTAGE_00
+        from openpyxl.utils import get_column_letter
+        thin = Side(border_style="thin", color="000000")
+        border = Border(top=thin, left=thin, right=thin, bottom=thin)
+        styles = (NamedStyle("header", font=Font(bold=True), border=border),
+                  NamedStyle("cell", border=border),
+                  NamedStyle("percent", border=border, number_format=FORMAT_PERCENTAGE_00))
+        wb = openpyxl.Workbook(write_only=True)
+        for style in styles:
+            wb.add_named_style(style)
+        cities_list_columns, cities_list_widths = self.cities_list_columns, self.cities_list_widths
+        if self.full_cities_list_columns is not None:
+            cities_list_columns, cities_list_widths = self.full_cities_list_columns, self.full_cities_list_widths
+        tables = (("Статистика по годам", self.years_list_headers, self.years_list_columns, self.years_list_widths,
+                   ("header",) * 5, ("cell",) * 5),
+                  ("Статистика по городам", self.cities_list_headers, cities_list_columns, cities_list_widths,
+                   ("header", "header", None, "header", "header"), ("cell", "cell", None, "cell", "percent")))
+        tables += tuple((title, headers, columns, widths, ("header",) * len(headers), ("cell",) * len(headers))
+                        for title, headers, columns, widths in self.quantile_tables)
+        for title, headers, columns, widths, header_styles, column_styles in tables:
+            ws = wb.create_sheet(title)
+            for i in range(len(widths)):
+                ws.column_dimensions[get_column_letter(i + 1)].width = widths[i]
+            ws.append([self.get_write_only_cell(WriteOnlyCell, ws, header, style)
+                       for header, style in zip(headers, header_styles)])
+            for row in self.get_rows(columns):
+                ws.append([self.get_write_only_cell(WriteOnlyCell, ws, value, style)
+                           for value, style in zip(row, column_styles)])
+        wb.save(file_name or self.excel_file)
+
+    def get_write_only_cell(self, cell_class, ws, value, style):
+        """Создаёт ячейку для листа в режиме write_only
+        Args:
+            cell_class (type): класс openpyxl.cell.WriteOnlyCell (импортируется один раз в export_excel)
+            ws (openpyxl.Workbook()): Excel лист
+            value (object): значение
+            style (string): название именованного стиля или None
+        Returns:
+            WriteOnlyCell: ячейка
+        """
+        cell = cell_class(ws, value=value)
+        if style is not None:
+            cell.style = style
+        return cell
+
+    @profiler.stage("Report.generate_image")
     def generate_image(self):
-        """Генерирует изображение"""
-        fig = plt.figure()
+        """Генерирует изображение. Фигура рисуется через Agg без pyplot: она не попадает в глобальный список
+        фигур и освобождается сборщиком мусора, поэтому изображения можно создавать в цикле и в процессах"""
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        fig = Figure()
+        FigureCanvasAgg(fig)
         self.get_vertical_chart("Уровень зарплат по годам", self.years_list_columns[1], "средняя з/п",
                                 self.years_list_columns[2], f"з/п {self.profession}", self.years_list_columns[0], fig,
                                 221)
@@ -474,30 +2282,533 @@ class Report:
                                   self.cities_list_columns[0], fig)
         self.get_pie_chart("Доля вакансий по городам", self.cities_list_columns[4], self.cities_list_columns[3], fig)
         fig.tight_layout()
-        plt.savefig('graph.png')
+        fig.savefig(self.image_file)
 
+    def get_chart_key(self):
+        """Возвращает хеш данных диаграмм: одинаковые данные дают одинаковое изображение
+        Returns:
+            string: хеш
+        """
+        chart_data = [CHART_CACHE_VERSION, self.profession, self.years_list_columns, self.cities_list_columns]
+        return hashlib.blake2b(json.dumps(chart_data, ensure_ascii=False).encode(), digest_size=16).hexdigest()
+
+    def generate_cached_image(self, cache_directory=CHART_CACHE_DIRECTORY, cache_size=CHART_CACHE_SIZE):
+        """Копирует изображение с диаграммами из кеша, рисуя его только для ещё не встречавшихся данных.
+        В кеше остаются cache_size изображений, которые использовались последними
+        Args:
+            cache_directory (string): папка кеша изображений
+            cache_size (int): наибольшее количество изображений в кеше
+        """
+        cached_file = os.path.join(cache_directory, f"{self.get_chart_key()}.png")
+        if not os.path.exists(cached_file):
+            self.generate_image()
+            os.makedirs(cache_directory, exist_ok=True)
+            temporary_file = f"{cached_file}.{os.getpid()}.tmp"
+            shutil.copyfile(self.image_file, temporary_file)
+            os.replace(temporary_file, cached_file)
+            evict_cached_files(cache_directory, ".png", cache_size)
+            return
+        os.utime(cached_file)
+        if not os.path.exists(self.image_file) or not os.path.samefile(cached_file, self.image_file):
+            shutil.copyfile(cached_file, self.image_file)
+
+    @staticmethod
+    def get_rows(columns):
+        """Переводит столбцы таблицы в строки. Столбцы разной длины - ошибка: zip молча обрезал бы таблицу
+        и сдвинул значения относительно первого столбца
+        Args:
+            columns (list): столбцы таблицы
+        Returns:
+            list: строки таблицы
+        >>> Report.get_rows([[2021, 2022], [100, 200]])
+        [[2021, 100], [2022, 200]]
+        >>> Report.get_rows([[2021, 2022], [200]])
+        Traceback (most recent call last):
+        ...
+        ValueError: Столбцы таблицы разной длины: [1, 2]
+        """
+        lengths = sorted({len(column) for column in columns})
+        if len(lengths) > 1:
+            raise ValueError(f"Столбцы таблицы разной длины: {lengths}")
+        return [list(row) for row in zip(*columns)]
+
+    def get_pdf_tables(self):
+        """Формирует строки таблиц для pdf документа: заголовки и значения, доли вакансий - в процентах
+        Returns:
+            list: строки таблицы по годам
+            list: строки таблицы по городам
+            list: названия и строки таблиц квантилей зарплат
+        """
+        years_list = [list(self.years_list_headers)] + self.get_rows(self.years_list_columns)
+        cities_list = [list(self.cities_list_headers)]
+        for city, salary, empty, share_city, share in self.get_rows(self.cities_list_columns):
+            cities_list.append([city, salary, empty, share_city, str(round(share * 100, 2)).replace('.', ',') + '%'])
+        quantile_lists = [(title, [list(headers)] + self.get_rows(columns))
+                          for title, headers, columns, widths in self.quantile_tables]
+        return years_list, cities_list, quantile_lists
+
+    @profiler.stage("Report.generate_pdf")
     def generate_pdf(self):
-        """Генерирует pdf документ"""
-        years_list, cities_list = self.generate_excel()
-        self.generate_image()
-        for cell in cities_list['E']:
-            if cell.value == "Доля вакансий":
-                continue
-            cell.value = str(round(float(cell.value) * 100, 2)).replace('.', ',') + '%'
+        """Генерирует pdf документ: шаблон получает готовые строки таблиц, а изображение берётся из кеша"""
+        import pdfkit
+        self.generate_cached_image()
+        years_list, cities_list, quantile_lists = self.get_pdf_tables()
+        pdf_template = get_pdf_template().render(
+            {'profession': f'{self.profession}', 'image_file': os.path.abspath(self.image_file),
+             'years_list': years_list, 'cities_list': cities_list, 'quantile_lists': quantile_lists})
+        pdfkit.from_string(pdf_template, self.pdf_file, configuration=get_pdf_configuration(),
+                           options={'enable-local-file-access': None})
 
-        env = Environment(loader=FileSystemLoader('.'))
-        pdf_template = env.get_template("pdf_template.html").render(
-            {'profession': f'{self.profession}', 'image_file': "graph.png",
-             'years_list': years_list, 'cities_list': cities_list})
-        config = pdfkit.configuration(wkhtmltopdf=r'C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe')
-        pdfkit.from_string(pdf_template, 'report.pdf', configuration=config, options={'enable-local-file-access': None})
+
+def get_quantile_name(quantile):
+    """Возвращает название квантиля зарплат для заголовка таблицы
+    Args:
+        quantile (float): уровень квантиля от 0 до 1
+    Returns:
+        string: название
+    >>> get_quantile_name(0.5), get_quantile_name(0.9)
+    ('Медиана зарплат', '90-й перцентиль зарплат')
+    """
+    if quantile == 0.5:
+        return "Медиана зарплат"
+    return f"{round(quantile * 100)}-й перцентиль зарплат"
+
+
+@functools.lru_cache(maxsize=None)
+def get_pdf_template(template_name=PDF_TEMPLATE):
+    """Возвращает скомпилированный шаблон pdf документа; окружение Jinja создаётся один раз на процесс
+    Args:
+        template_name (string): название шаблона (ищется в текущей папке и рядом с main.py)
+    Returns:
+        jinja2.Template: шаблон
+    """
+    from jinja2 import Environment, FileSystemLoader
+    env = Environment(loader=FileSystemLoader(['.', os.path.dirname(os.path.abspath(__file__))]))
+    return env.get_template(template_name)
 
 
-def run_program():
-    """Запускает программу"""
-    global profession
+@functools.lru_cache(maxsize=None)
+def get_pdf_configuration():
+    """Возвращает настройки pdfkit; путь к wkhtmltopdf проверяется один раз на процесс
+    Returns:
+        pdfkit.configuration: настройки
+    """
+    import pdfkit
+    return pdfkit.configuration(wkhtmltopdf=r'C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe')
+
+
+def run_program(profile=False, memory=False):
+    """Запускает программу
+    Args:
+        profile (bool): включить замеры этапов (также включаются переменной окружения VACANCIES_PROFILE)
+        memory (bool): замерять ли пиковую память этапов (также включается переменной VACANCIES_PROFILE_MEMORY)
+    """
+    if profile or memory:
+        profiler.enable(os.environ.get(PROFILE_DIRECTORY_ENV), memory or get_env_flag(PROFILE_MEMORY_ENV))
     file_name = input("Введите название файла: ")
     profession = input("Введите профессию: ")
-    dataset = DataSet(file_name, profession)
+    create_report(file_name, profession)
+
+
+@profiler.stage("run_program")
+def create_report(file_name, profession):
+    """Считает статистику и создаёт отчёт; замеряется как этап run_program без времени ожидания ввода.
+    Файл загружается по столбцам через кэш, так что повторный запуск по тому же файлу не разбирает CSV заново;
+    если кэш рядом с файлом записать нельзя, отчёт создаётся без него
+    Args:
+        file_name (string): название файла
+        profession (string): профессия
+    """
+    dataset = DataSet(file_name, profession, "columnar", cache=True)
     dataset.print_information()
-    Report(dataset).generate_pdf()
\ No newline at end of file
+    report = Report(dataset)
+    report.export_excel()
+    report.generate_pdf()
+
+
+def print_statistics(file_name, professions, mode="columnar", rates_file=None, cache=False):
+    """Выводит статистику профессий без создания отчётов: библиотеки для Excel, диаграмм и pdf не загружаются
+    Args:
+        file_name (string): название файла
+        professions (list): список профессий
+        mode (string): режим загрузки DataSet
+        rates_file (string): CSV файл курсов валют по датам
+        cache (bool): хранить ли разобранные столбцы в файле кэша рядом с исходным (только в режиме "columnar")
+    """
+    dataset = DataSet(file_name, professions[0], mode, cache=cache, rates_file=rates_file)
+    for profession in dict.fromkeys(professions):
+        print(f"Профессия: {profession}")
+        dataset.stats_for(profession).print_information()
+
+
+def run_batch(file_name, professions, output_directory="reports", mode="columnar", workers=None,
+              formats=REPORT_FORMATS, full_cities=False, rates_file=None, quantiles=False, cache=False):
+    """Загружает файл один раз и параллельно создаёт отчёты для нескольких профессий
+    Args:
+        file_name (string): название файла
+        professions (list): список профессий
+        output_directory (string): папка, в которой для каждой профессии создаётся своя папка с отчётом
+        mode (string): режим загрузки DataSet
+        workers (int): количество процессов для создания отчётов (по умолчанию - по числу ядер)
+        formats (tuple): создаваемые файлы, из REPORT_FORMATS
+        full_cities (bool): выводить ли в Excel таблицу по всем городам
+        rates_file (string): CSV файл курсов валют по датам (по умолчанию - курсы из currency_to_rub)
+        quantiles (bool): добавлять ли в отчёты таблицы квантилей зарплат
+        cache (bool): хранить ли разобранные столбцы в файле кэша рядом с исходным (только в режиме "columnar")
+    Returns:
+        dict: Словарь типа {ключ-профессия : значение-папка с отчётом}
+        list: профессии, для которых отчёт создать не удалось (ошибки выводятся в stderr)
+    """
+    dataset = DataSet(file_name, professions[0], mode, cache=cache, rates_file=rates_file, quantiles=quantiles)
+    directories = get_unique_directories(professions, output_directory)
+    futures = {}
+    with ProcessPoolExecutor(workers) as executor:
+        for profession in dict.fromkeys(professions):
+            profession_dataset = dataset.stats_for(profession)
+            profession_dataset.print_information()
+            os.makedirs(directories[profession], exist_ok=True)
+            report = Report(profession_dataset, directories[profession], full_cities, quantiles)
+            futures[profession] = executor.submit(render_report, report, formats)
+        failed = []
+        for profession, future in futures.items():
+            try:
+                future.result()
+            except Exception as exception:
+                print(f"Не удалось создать отчёт для профессии {profession}: {exception}", file=sys.stderr)
+                failed.append(profession)
+    return directories, failed
+
+
+def render_report(report, formats=REPORT_FORMATS):
+    """Создаёт файлы отчёта (выполняется в процессе-обработчике)
+    Args:
+        report (Report): отчёт
+        formats (tuple): создаваемые файлы, из REPORT_FORMATS
+    """
+    if "excel" in formats:
+        report.export_excel()
+    if "image" in formats:
+        report.generate_cached_image()
+    if "pdf" in formats:
+        report.generate_pdf()
+
+
+def render_report_file(report, report_format):
+    """Создаёт один файл отчёта во временной папке и возвращает его содержимое (выполняется в процессе-обработчике)
+    Args:
+        report (Report): отчёт
+        report_format (string): файл, один из REPORT_FORMATS
+    Returns:
+        bytes: содержимое файла
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        report.set_output_directory(directory)
+        render_report(report, (report_format,))
+        with open(os.path.join(directory, REPORT_FILES[report_format][0]), "rb") as File:
+            return File.read()
+
+
+class StatsServer:
+    """HTTP сервер статистики на asyncio: файл загружается один раз, статистика для профессий отдаётся из
+    памяти через DataSet.stats_for, а файлы отчётов создаются в пуле процессов, не останавливая цикл событий.
+    Обращения к набору данных (stats_for, квантили) выполняются по очереди в отдельном потоке, поэтому подсчёт
+    для новой профессии не задерживает остальные соединения.
+
+    GET /stats?profession=... - JSON со статистикой профессии
+    GET /report/excel|image|pdf?profession=... - файл отчёта
+
+    Attributes:
+        dataset (DataSet): загруженный набор данных
+        executor (ProcessPoolExecutor): пул процессов для создания отчётов
+        quantiles (bool): добавлять ли квантили зарплат в статистику и отчёты
+        dataset_executor (ThreadPoolExecutor): поток для обращений к набору данных
+    """
+
+    def __init__(self, dataset, executor=None, quantiles=False):
+        """Инициализируект объект StatsServer
+        Args:
+            dataset (DataSet): загруженный набор данных
+            executor (ProcessPoolExecutor): пул процессов для создания отчётов
+            quantiles (bool): добавлять ли квантили зарплат в статистику и отчёты
+        """
+        self.dataset = dataset
+        self.executor = executor
+        self.quantiles = quantiles
+        self.dataset_executor = ThreadPoolExecutor(1)
+
+    def get_statistics(self, profession):
+        """Возвращает статистику профессии в виде, пригодном для JSON
+        Args:
+            profession (string): профессия
+        Returns:
+            dict: Словарь типа {ключ-название словаря статистики : значение-словарь}
+        >>> server = StatsServer(DataSet("vacancies.csv", "Программист", "columnar"))
+        >>> server.get_statistics("Аналитик")["salary_by_years_for_profession"] == DataSet("vacancies.csv", "Аналитик").salary_by_years_for_profession
+        True
+        """
+        dataset = self.dataset.stats_for(profession)
+        statistics = {"profession": profession, "rows_count": dataset.get_rows_count()}
+        for name in ("salary_by_years", "vacancies_count_by_years", "salary_by_years_for_profession",
+                     "vacancies_count_by_years_for_profession", "salary_by_cities", "vacancies_share_by_cities"):
+            statistics[name] = getattr(dataset, name)
+        if self.quantiles:
+            for name, quantiles in zip(("salary_quantiles_by_years", "salary_quantiles_by_years_for_profession",
+                                        "salary_quantiles_by_cities"), dataset.get_salary_quantiles()):
+                statistics[name] = quantiles
+        return statistics
+
+    def get_report(self, profession):
+        """Создаёт отчёт для профессии (файлы отчёта создаются отдельно в пуле процессов)
+        Args:
+            profession (string): профессия
+        Returns:
+            Report: отчёт
+        """
+        return Report(self.dataset.stats_for(profession), quantiles=self.quantiles)
+
+    async def route(self, path, query):
+        """Выбирает ответ на запрос
+        Args:
+            path (string): путь запроса
+            query (dict): параметры запроса из parse_qs
+        Returns:
+            int: код ответа
+            string: тип содержимого
+            bytes: содержимое
+        >>> import asyncio
+        >>> server = StatsServer(DataSet("vacancies.csv", "Программист", "columnar"))
+        >>> status, content_type, body = asyncio.run(server.route("/stats", {"profession": ["Аналитик"]}))
+        >>> status, content_type, json.loads(body)["profession"]
+        (200, 'application/json; charset=utf-8', 'Аналитик')
+        >>> asyncio.run(server.route("/stats", {}))[0], asyncio.run(server.route("/unknown", {}))[0]
+        (400, 404)
+        """
+        import asyncio
+        if path != "/stats" and not path.startswith("/report/"):
+            return self.get_error(404, "Неизвестный путь")
+        if not query.get("profession"):
+            return self.get_error(400, "Не указана профессия (profession)")
+        profession = query["profession"][0]
+        loop = asyncio.get_running_loop()
+        if path == "/stats":
+            statistics = await loop.run_in_executor(self.dataset_executor, self.get_statistics, profession)
+            body = json.dumps(statistics, ensure_ascii=False).encode()
+            return 200, "application/json; charset=utf-8", body
+        report_format = path[len("/report/"):]
+        if report_format not in REPORT_FORMATS:
+            return self.get_error(404, f"Неизвестный файл отчёта: {report_format}")
+        report = await loop.run_in_executor(self.dataset_executor, self.get_report, profession)
+        try:
+            body = await loop.run_in_executor(self.executor, render_report_file, report, report_format)
+        except Exception as exception:
+            return self.get_error(500, f"Не удалось создать отчёт: {exception}")
+        return 200, REPORT_FILES[report_format][1], body
+
+    def get_error(self, status, message):
+        """Возвращает ответ с ошибкой в JSON
+        Args:
+            status (int): код ответа
+            message (string): текст ошибки
+        Returns:
+            int: код ответа
+            string: тип содержимого
+            bytes: содержимое
+        """
+        return status, "application/json; charset=utf-8", json.dumps({"error": message}, ensure_ascii=False).encode()
+
+    async def handle(self, reader, writer):
+        """Обрабатывает одно соединение: читает запрос GET и отправляет ответ
+        Args:
+            reader (asyncio.StreamReader): поток чтения
+            writer (asyncio.StreamWriter): поток записи
+        """
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            while (await reader.readline()).strip():
+                pass
+            if len(request_line) != 3:
+                return
+            if request_line[0] != "GET":
+                status, content_type, body = self.get_error(405, "Поддерживается только GET")
+            else:
+                url = urlsplit(request_line[1])
+                status, content_type, body = await self.route(url.path, parse_qs(url.query))
+            writer.write(f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                         f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+                         f"Connection: close\r\n\r\n".encode("latin-1") + body)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host=SERVER_HOST, port=SERVER_PORT):
+        """Запускает сервер и обрабатывает запросы, пока процесс не будет остановлен
+        Args:
+            host (string): адрес
+            port (int): порт
+        """
+        import asyncio
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"Статистика по {self.dataset.file_name}: http://{host}:{port}/stats?profession=...")
+        async with server:
+            await server.serve_forever()
+
+
+def run_server(file_name, profession, host=SERVER_HOST, port=SERVER_PORT, mode="columnar", workers=None,
+               rates_file=None, quantiles=False, cache=False):
+    """Загружает файл один раз и запускает HTTP сервер статистики. Поддерживаются только режимы SERVER_MODES,
+    в которых статистика для другой профессии считается по данным в памяти, без повторного чтения файла
+    Args:
+        file_name (string): название файла
+        profession (string): профессия, для которой файл загружается первой
+        host (string): адрес
+        port (int): порт
+        mode (string): режим загрузки DataSet, один из SERVER_MODES
+        workers (int): количество процессов для создания отчётов (по умолчанию - по числу ядер)
+        rates_file (string): CSV файл курсов валют по датам
+        quantiles (bool): добавлять ли квантили зарплат в статистику и отчёты
+        cache (bool): хранить ли разобранные столбцы в файле кэша рядом с исходным (только в режиме "columnar")
+    """
+    import asyncio
+    if mode not in SERVER_MODES:
+        raise ValueError(f"Сервер поддерживает только режимы {', '.join(SERVER_MODES)}, а не {mode}")
+    dataset = DataSet(file_name, profession, mode, cache=cache, rates_file=rates_file, quantiles=quantiles)
+    with ProcessPoolExecutor(workers) as executor:
+        try:
+            asyncio.run(StatsServer(dataset, executor, quantiles).serve(host, port))
+        except KeyboardInterrupt:
+            pass
+
+
+def evict_cached_files(directory, suffix, size):
+    """Удаляет из папки кеша файлы с окончанием suffix, кроме size последних по времени изменения
+    (при попадании в кеш время обновляется, так что удаляются давно не использованные файлы)
+    Args:
+        directory (string): папка кеша
+        suffix (string): окончание названий файлов кеша
+        size (int): сколько файлов оставить
+    >>> import tempfile
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     for i in range(5):
+    ...         open(os.path.join(directory, f"{i}.png"), "w").close()
+    ...         os.utime(os.path.join(directory, f"{i}.png"), (i, i))
+    ...     evict_cached_files(directory, ".png", 2)
+    ...     sorted(os.listdir(directory))
+    ['3.png', '4.png']
+    """
+    files = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith(suffix):
+            try:
+                files.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                continue
+    files.sort(reverse=True)
+    for mtime, path in files[size:]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def get_unique_directories(professions, output_directory):
+    """Подбирает для каждой профессии отдельную папку, даже если названия совпадают после замены символов
+    Args:
+        professions (list): список профессий
+        output_directory (string): общая папка
+    Returns:
+        dict: Словарь типа {ключ-профессия : значение-папка}
+    >>> get_unique_directories(["C/C++", "C_C++", "Аналитик"], "reports")
+    {'C/C++': 'reports/C_C++', 'C_C++': 'reports/C_C++_2', 'Аналитик': 'reports/Аналитик'}
+    """
+    directories = {}
+    used = set()
+    for profession in professions:
+        if profession in directories:
+            continue
+        name = get_safe_file_name(profession)
+        unique_name, number = name, 1
+        while unique_name.lower() in used:
+            number += 1
+            unique_name = f"{name}_{number}"
+        used.add(unique_name.lower())
+        directories[profession] = os.path.join(output_directory, unique_name)
+    return directories
+
+
+def get_safe_file_name(name):
+    """Заменяет в строке символы, недопустимые в названии файла; названия только из точек ("." и "..")
+    указывали бы на текущую или родительскую папку, поэтому точки в них тоже заменяются
+    Args:
+        name (string): строка
+    Returns:
+        string: название файла
+    >>> get_safe_file_name("C/C++ программист")
+    'C_C++ программист'
+    >>> get_safe_file_name("."), get_safe_file_name(" .. "), get_safe_file_name(""), get_safe_file_name("C.NET")
+    ('_', '__', '_', 'C.NET')
+    """
+    name = "".join("_" if symbol in '<>:"/\\|?*' else symbol for symbol in name).strip()
+    if not name.strip("."):
+        name = name.replace(".", "_")
+    return name or "_"
+
+
+def main(arguments=None):
+    """Разбирает аргументы командной строки: без файла запускает диалог run_program,
+    с --convert переводит файл в столбцы, с --serve запускает HTTP сервер статистики,
+    с --stats только выводит статистику, с файлом и профессиями - создаёт отчёты по всем профессиям через run_batch
+    Args:
+        arguments (list): аргументы командной строки (по умолчанию - sys.argv)
+    """
+    parser = argparse.ArgumentParser(description="Статистика вакансий и отчёты по профессиям")
+    parser.add_argument("file", nargs="?", help="файл вакансий (без него программа спрашивает файл и профессию)")
+    parser.add_argument("-p", "--professions", nargs="+", help="профессии")
+    parser.add_argument("-o", "--output", default="reports", help="папка для отчётов")
+    parser.add_argument("-m", "--mode", choices=DATASET_MODES, default="columnar", help="режим загрузки DataSet")
+    parser.add_argument("-w", "--workers", type=int, help="количество процессов для создания отчётов")
+    parser.add_argument("--formats", nargs="+", choices=REPORT_FORMATS, default=list(REPORT_FORMATS),
+                        help="создаваемые файлы")
+    parser.add_argument("--rates", help="CSV файл курсов валют по датам (столбец date и столбец на каждую валюту)")
+    parser.add_argument("--cache", action="store_true",
+                        help="в режиме columnar хранить разобранные столбцы в файле кэша рядом с исходным")
+    parser.add_argument("--quantiles", action="store_true", help="добавлять в отчёты медиану и перцентили зарплат")
+    parser.add_argument("--full-cities", action="store_true", help="выводить в Excel таблицу по всем городам")
+    parser.add_argument("--profile", action="store_true", help="замерять этапы работы программы")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="замерять этапы вместе с пиковой памятью (tracemalloc замедляет этапы)")
+    parser.add_argument("--stats", action="store_true", help="только вывести статистику профессий, без отчётов")
+    parser.add_argument("--serve", action="store_true", help="запустить HTTP сервер статистики по файлу")
+    parser.add_argument("--host", default=SERVER_HOST, help="адрес HTTP сервера")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="порт HTTP сервера")
+    parser.add_argument("--convert", metavar="TARGET",
+                        help="перевести CSV файл в столбцы (.npz, папка .columns, .parquet, .feather)")
+    parser.add_argument("--validation", choices=VALIDATION_MODES, default="all",
+                        help="какие поля строки должны быть непустыми при переводе")
+    args = parser.parse_args(arguments)
+    if args.file is None:
+        run_program(args.profile, args.profile_memory)
+        return
+    if args.convert:
+        print(f"Вакансий в {args.convert}: {convert_file(args.file, args.convert, args.validation)}")
+        return
+    if args.serve:
+        if args.mode not in SERVER_MODES:
+            parser.error(f"--serve поддерживает только режимы {', '.join(SERVER_MODES)}")
+        run_server(args.file, (args.professions or [""])[0], args.host, args.port, args.mode, args.workers, args.rates,
+                   args.quantiles, args.cache)
+        return
+    if not args.professions:
+        parser.error("для файла нужно указать хотя бы одну профессию (--professions)")
+    if args.stats:
+        print_statistics(args.file, args.professions, args.mode, args.rates, args.cache)
+        return
+    if args.profile or args.profile_memory:
+        profiler.enable(os.environ.get(PROFILE_DIRECTORY_ENV), args.profile_memory or get_env_flag(PROFILE_MEMORY_ENV))
+    _, failed = run_batch(args.file, args.professions, args.output, args.mode, args.workers, tuple(args.formats),
+                          args.full_cities, args.rates, args.quantiles, args.cache)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()